@@ -0,0 +1,168 @@
+"""
+Kafka producer settings for ORDER_CREATE / ORDER_UPDATE messages:
+serializer speed (stdlib json vs. orjson vs. the binary events codec) and, per
+compression type and batch size, record batches per partition and bytes on the wire.
+
+Batches are built offline with aiokafka's own record batch builder, so no broker is needed.
+With --broker the messages are also produced for real and messages/second is measured.
+
+    python benchmarks/kafka_producer.py --messages 100000
+    python benchmarks/kafka_producer.py --messages 100000 --format binary
+    python benchmarks/kafka_producer.py --messages 100000 --broker localhost:9092 --topic bench
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import orjson
+from aiokafka.codec import has_lz4, has_snappy, has_zstd
+from aiokafka.record.default_records import DefaultRecordBatch, DefaultRecordBatchBuilder
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'orders_service' / 'app'))
+
+import events  # noqa: E402
+
+CODECS = {
+    None: (lambda: True, DefaultRecordBatch.CODEC_NONE),
+    'gzip': (lambda: True, DefaultRecordBatch.CODEC_GZIP),
+    'snappy': (has_snappy, DefaultRecordBatch.CODEC_SNAPPY),
+    'lz4': (has_lz4, DefaultRecordBatch.CODEC_LZ4),
+    'zstd': (has_zstd, DefaultRecordBatch.CODEC_ZSTD),
+}
+BATCH_SIZES = (16384, 65536, 262144)
+
+
+def make_messages(count: int) -> list[dict]:
+    return [
+        {
+            'order_id': str(uuid.uuid4()),
+            'delivery_price': random.randint(0, 100_000) / 100,
+            'cart_price': random.randint(1, 10_000_000) / 100,
+            'total_price': random.randint(1, 10_000_000) / 100,
+            'status': 'updated',
+        }
+        for _ in range(count)
+    ]
+
+
+def to_events(messages: list[dict]) -> list[events.OrderUpdated]:
+    return [events.OrderUpdated.from_json_dict(message) for message in messages]
+
+
+def measure_serializer(func, messages: list[dict], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for message in messages:
+            func(message)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def build_batches(values: list[bytes], codec: int, batch_size: int) -> tuple[int, int, float]:
+    """Packs the values as one partition's producer would; returns (batches, bytes, seconds)."""
+    batches = 0
+    total_bytes = 0
+    start = time.perf_counter()
+    builder = None
+    offset = 0
+    for value in values:
+        if builder is None:
+            builder = DefaultRecordBatchBuilder(2, codec, 0, -1, -1, -1, batch_size)
+            offset = 0
+        if builder.append(offset, timestamp=None, key=None, value=value, headers=[]) is None:
+            total_bytes += len(builder.build())
+            batches += 1
+            builder = DefaultRecordBatchBuilder(2, codec, 0, -1, -1, -1, batch_size)
+            builder.append(0, timestamp=None, key=None, value=value, headers=[])
+            offset = 0
+        offset += 1
+    if builder is not None:
+        total_bytes += len(builder.build())
+        batches += 1
+    return batches, total_bytes, time.perf_counter() - start
+
+
+async def produce(broker: str, topic: str, values: list[bytes], **producer_config) -> float:
+    from aiokafka import AIOKafkaProducer
+
+    producer = AIOKafkaProducer(bootstrap_servers=broker, **producer_config)
+    await producer.start()
+    try:
+        start = time.perf_counter()
+        deliveries = [await producer.send(topic, value=value) for value in values]
+        await asyncio.gather(*deliveries)
+        return time.perf_counter() - start
+    finally:
+        await producer.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--format', choices=('json', 'binary'), default='json', help='Values used for batches.')
+    parser.add_argument('--broker', help='Kafka bootstrap server; measures real produce throughput.')
+    parser.add_argument('--topic', default='producer_benchmark')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    messages = make_messages(args.messages)
+
+    stdlib_time = measure_serializer(lambda v: json.dumps(v).encode('utf-8'), messages, args.repeat)
+    orjson_time = measure_serializer(orjson.dumps, messages, args.repeat)
+    assert all(orjson.loads(orjson.dumps(m)) == json.loads(json.dumps(m)) for m in messages[:1000])
+    print(f'{"serializer":<16}{"total, s":>12}{"messages/s":>14}')
+    print(f'{"json":<16}{stdlib_time:>12.4f}{args.messages / stdlib_time:>14,.0f}')
+    print(f'{"orjson":<16}{orjson_time:>12.4f}{args.messages / orjson_time:>14,.0f}')
+    order_events = to_events(messages)
+    binary_time = measure_serializer(events.encode, order_events, args.repeat)
+    assert all(events.decode(events.encode(e), events.OrderUpdated) == e for e in order_events[:1000])
+    print(f'{"events binary":<16}{binary_time:>12.4f}{args.messages / binary_time:>14,.0f}')
+    print(f'orjson speedup over json: {stdlib_time / orjson_time:.2f}x\n')
+
+    if args.format == 'binary':
+        values = [events.encode(event) for event in order_events]
+    else:
+        values = [orjson.dumps(message) for message in messages]
+    raw_bytes = sum(len(value) for value in values)
+    print(f'{len(values)} {args.format} messages, {raw_bytes:,} bytes of values\n')
+    print(f'{"compression":<13}{"batch size":>11}{"batches":>10}{"bytes":>14}{"ratio":>8}{"build msg/s":>14}')
+    for name, (available, codec) in CODECS.items():
+        if not available():
+            print(f'{str(name):<13}{"(codec library not installed)":>40}')
+            continue
+        for batch_size in BATCH_SIZES:
+            batches, total_bytes, seconds = build_batches(values, codec=codec, batch_size=batch_size)
+            print(
+                f'{str(name):<13}{batch_size:>11}{batches:>10}{total_bytes:>14,}'
+                f'{total_bytes / raw_bytes:>8.2f}{len(values) / seconds:>14,.0f}'
+            )
+
+    if args.broker:
+        print(f'\n{"compression":<13}{"linger_ms":>10}{"batch size":>11}{"produce msg/s":>16}')
+        for name, (available, _) in CODECS.items():
+            if not available():
+                continue
+            for linger_ms, batch_size in ((0, 16384), (5, 65536), (20, 262144)):
+                seconds = asyncio.run(produce(
+                    args.broker,
+                    args.topic,
+                    values,
+                    acks='all',
+                    enable_idempotence=True,
+                    compression_type=name,
+                    linger_ms=linger_ms,
+                    max_batch_size=batch_size,
+                ))
+                print(f'{str(name):<13}{linger_ms:>10}{batch_size:>11}{len(values) / seconds:>16,.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Per-message Decimal price conversion vs. batch integer (cents) conversion
+of order_worker_service. Checks that both give identical prices.
+
+    python benchmarks/price_conversion.py --orders 100000 --repeat 5
+"""
+import argparse
+import random
+import sys
+import time
+from decimal import Decimal, ROUND_HALF_UP
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'order_worker_service' / 'app'))
+
+from events import to_minor_units, minor_units_to_decimal  # noqa: E402
+from money import convert_minor_units  # noqa: E402
+
+
+def convert_decimal(orders: list[tuple[Decimal, Decimal]], rate: float) -> list[tuple[Decimal, Decimal, Decimal]]:
+    """Previous per-message path of order_worker_service process_message."""
+    result = []
+    for cart_price, delivery_price in orders:
+        rate_decimal: Decimal = Decimal(str(rate))
+
+        delivery_price_target = (delivery_price * rate_decimal).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        cart_price_target = (cart_price * rate_decimal).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        total_price_target = cart_price_target + delivery_price_target
+        result.append((cart_price_target, delivery_price_target, total_price_target))
+    return result
+
+
+def convert_batch(orders: list[tuple[Decimal, Decimal]], rate: float) -> list[tuple[Decimal, Decimal, Decimal]]:
+    amounts = []
+    for cart_price, delivery_price in orders:
+        amounts.append(to_minor_units(cart_price))
+        amounts.append(to_minor_units(delivery_price))
+
+    converted = convert_minor_units(amounts=amounts, rate=rate)
+
+    result = []
+    for i in range(len(orders)):
+        cart_price_target, delivery_price_target = converted[2 * i], converted[2 * i + 1]
+        result.append((
+            minor_units_to_decimal(cart_price_target),
+            minor_units_to_decimal(delivery_price_target),
+            minor_units_to_decimal(cart_price_target + delivery_price_target),
+        ))
+    return result
+
+
+def measure(func, orders, rate, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(orders, rate)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    orders = [
+        (Decimal(random.randint(1, 10_000_000)).scaleb(-2), Decimal(random.randint(0, 100_000)).scaleb(-2))
+        for _ in range(args.orders)
+    ]
+    rates = [round(random.uniform(0.01, 200), random.randint(0, 6)) for _ in range(20)] + [90.125, 0.005, 1.0]
+
+    for rate in rates:
+        assert convert_decimal(orders[:10_000], rate) == convert_batch(orders[:10_000], rate), rate
+    print(f'Results identical for {len(rates)} rates.')
+
+    rate = 97.654321
+    decimal_time = measure(convert_decimal, orders, rate, args.repeat)
+    batch_time = measure(convert_batch, orders, rate, args.repeat)
+    print(f'{"path":<16}{"total, s":>12}{"orders/s":>14}')
+    print(f'{"decimal":<16}{decimal_time:>12.4f}{args.orders / decimal_time:>14,.0f}')
+    print(f'{"batch (cents)":<16}{batch_time:>12.4f}{args.orders / batch_time:>14,.0f}')
+    print(f'speedup: {decimal_time / batch_time:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
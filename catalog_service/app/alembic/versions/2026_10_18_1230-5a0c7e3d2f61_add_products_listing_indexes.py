@@ -0,0 +1,48 @@
+"""Add products listing indexes
+
+Revision ID: 5a0c7e3d2f61
+Revises: 9b1bbb306359
+Create Date: 2026-10-18 12:30:48.102735
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5a0c7e3d2f61"
+down_revision: Union[str, None] = "9b1bbb306359"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_products_created_at_id",
+        "products",
+        ["created_at", "id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_products_category_id_created_at_id",
+        "products",
+        ["category_id", "created_at", "id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_products_price",
+        "products",
+        ["price"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_products_price", table_name="products")
+    op.drop_index("ix_products_category_id_created_at_id", table_name="products")
+    op.drop_index("ix_products_created_at_id", table_name="products")
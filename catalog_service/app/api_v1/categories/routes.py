@@ -1,5 +1,6 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Request, Response, status
 
+from cache import CachedResponse
 from models import Category
 from permissions import permission_required
 from . import services
@@ -23,12 +24,14 @@ async def create_category(
 @router.get(
     '',
     response_model=list[CategoriesSchema],
+    responses={status.HTTP_304_NOT_MODIFIED: {'description': 'Matches the If-None-Match ETag.'}},
     dependencies=[Depends(permission_required('categories_read'))],
 )
 async def get_categories(
-        categories: list[Category] = Depends(services.get_categories),
-):
-    return categories
+        request: Request,
+        categories: CachedResponse = Depends(services.get_categories),
+) -> Response:
+    return categories.to_response(request)
 
 
 @router.put(
@@ -1,20 +1,21 @@
 import logging
-import pickle
 from datetime import timedelta
 from uuid import UUID
 
+import orjson
 from fastapi import Depends, Request, Path, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from cache import CachedResponse, cached
 from config import settings
 from db import get_db
 from models import Category
 from . import crud
-from .schemas import CategoryCreateSchema, CategoryUpdateSchema
+from .schemas import CategoryCreateSchema, CategoryUpdateSchema, CategoriesSchema
 
 logger = logging.getLogger(__name__)
 
-CATEGORIES_KEY = 'categories:all'
+CATEGORIES_CACHE = 'categories'
 
 
 async def create_category(
@@ -23,29 +24,22 @@ async def create_category(
         session: AsyncSession = Depends(get_db),
 ) -> Category:
     category = await crud.create_category(session=session, data=category_data)
-    await request.app.state.redis.delete(CATEGORIES_KEY)
+    await request.app.state.cache.invalidate(CATEGORIES_CACHE)
     return category
 
 
+@cached(CATEGORIES_CACHE, ttl=int(timedelta(days=settings.redis.categories_ttl).total_seconds()))
 async def get_categories(
         request: Request,
         session: AsyncSession = Depends(get_db),
-) -> list[Category]:
-    cached_categories = await request.app.state.redis.get(CATEGORIES_KEY)
-    if cached_categories is not None:
-        categories = pickle.loads(cached_categories)
-        logger.info('Categories taken from Redis.')
-        return categories
-
+) -> CachedResponse:
+    """Categories as the final JSON bytes with their ETag; cache hits are returned without deserializing."""
     categories = await crud.get_categories(session=session)
     logger.info('Categories taken from Postgres.')
-    await request.app.state.redis.set(
-        name=CATEGORIES_KEY,
-        value=pickle.dumps(categories),
-        ex=timedelta(days=settings.redis.categories_ttl),
-    )
-    logger.info('Categories are installed in Redis.')
-    return categories
+    return CachedResponse.from_content(orjson.dumps([
+        CategoriesSchema.model_validate(category, from_attributes=True).model_dump()
+        for category in categories
+    ]))
 
 
 async def get_category_by_id(
@@ -68,7 +62,7 @@ async def update_category(
         session: AsyncSession = Depends(get_db),
 ) -> Category:
     category = await crud.update_category(session=session, category=category, category_data=category_data)
-    await request.app.state.redis.delete(CATEGORIES_KEY)
+    await request.app.state.cache.invalidate(CATEGORIES_CACHE)
     return category
 
 
@@ -78,4 +72,4 @@ async def delete_category(
         session: AsyncSession = Depends(get_db),
 ) -> None:
     await crud.delete_category(session=session, category=category)
-    await request.app.state.redis.delete(CATEGORIES_KEY)
+    await request.app.state.cache.invalidate(CATEGORIES_CACHE)
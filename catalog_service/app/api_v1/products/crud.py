@@ -1,9 +1,16 @@
+from datetime import datetime
+from decimal import Decimal
 from uuid import UUID
 
-from api_v1.products.schemas import ProductCreateSchema, ProductUpdateSchema, ProductUpdatePartialSchema
-from sqlalchemy import select
+from api_v1.products.schemas import (
+    ProductCreateSchema,
+    ProductUpdateSchema,
+    ProductUpdatePartialSchema,
+    ProductFilterSchema,
+)
+from sqlalchemy import Select, select, any_, bindparam, literal, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
 from models import Product
 
@@ -12,17 +19,48 @@ async def get_product(session: AsyncSession, product_id: UUID) -> Product | None
     return await session.get(Product, product_id)
 
 
-async def get_products(session: AsyncSession) -> list[Product]:
-    result = await session.scalars(
-        select(Product)
-        .options(
-            selectinload(Product.category)
+def filter_products(stmt: Select, filters: ProductFilterSchema) -> Select:
+    if filters.category_id is not None:
+        stmt = stmt.where(Product.category_id == filters.category_id)
+    if filters.min_price is not None:
+        stmt = stmt.where(Product.price >= filters.min_price)
+    if filters.max_price is not None:
+        stmt = stmt.where(Product.price <= filters.max_price)
+    return stmt
+
+
+async def get_products(
+        session: AsyncSession,
+        filters: ProductFilterSchema,
+        limit: int,
+        after: tuple[datetime, UUID] | None = None,
+) -> list[Product]:
+    """Page of products, newest first, strictly after the (created_at, id) keyset "after"."""
+    stmt = filter_products(select(Product), filters=filters)
+    if after is not None:
+        created_at, product_id = after
+        stmt = stmt.where(
+            tuple_(Product.created_at, Product.id)
+            < tuple_(literal(created_at, Product.created_at.type), literal(product_id, Product.id.type))
         )
-        .order_by(Product.created_at.desc())
+    result = await session.scalars(
+        stmt
+        .order_by(Product.created_at.desc(), Product.id.desc())
+        .limit(limit)
     )
     return list(result.all())
 
 
+async def get_product_prices(session: AsyncSession, product_ids: list[UUID]) -> list[tuple[UUID, Decimal]]:
+    """One `WHERE id = ANY(:product_ids)` query: a single array bind parameter regardless of list size."""
+    ids_param = bindparam('product_ids', value=product_ids, type_=ARRAY(PG_UUID(as_uuid=True)))
+    result = await session.execute(
+        select(Product.id, Product.price)
+        .where(Product.id == any_(ids_param))
+    )
+    return list(result.tuples().all())
+
+
 async def create_product(session: AsyncSession, data: ProductCreateSchema) -> Product:
     product = Product(**data.model_dump())
     session.add(product)
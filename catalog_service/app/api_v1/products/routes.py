@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Request, Response, status
 
+from cache import CachedResponse
 from models import Product
 from permissions import permission_required
 from . import services
-from .schemas import ProductSchema, ProductsSchema
+from .schemas import ProductSchema, ProductsPageSchema, ProductPriceSchema
 
 router = APIRouter(prefix='/products', tags=['Products'])
 
@@ -22,24 +23,39 @@ async def create_product(
 
 @router.get(
     '',
-    response_model=list[ProductsSchema],
+    response_model=ProductsPageSchema,
+    responses={status.HTTP_304_NOT_MODIFIED: {'description': 'Matches the If-None-Match ETag.'}},
     dependencies=[Depends(permission_required('products_read'))],
 )
 async def get_products(
-        products: list[Product] = Depends(services.get_products),
+        request: Request,
+        page: CachedResponse = Depends(services.get_products),
+) -> Response:
+    return page.to_response(request)
+
+
+@router.post(
+    '/prices',
+    response_model=list[ProductPriceSchema],
+    dependencies=[Depends(permission_required('products_read'))],
+)
+async def get_product_prices(
+        prices: list[ProductPriceSchema] = Depends(services.get_product_prices),
 ):
-    return products
+    return prices
 
 
 @router.get(
     '/{product_id}',
     response_model=ProductSchema,
+    responses={status.HTTP_304_NOT_MODIFIED: {'description': 'Matches the If-None-Match ETag.'}},
     dependencies=[Depends(permission_required('products_read'))],
 )
 async def get_product(
-        product: Product = Depends(services.get_product_by_id),
-):
-    return product
+        request: Request,
+        product: CachedResponse = Depends(services.get_product_detail),
+) -> Response:
+    return product.to_response(request)
 
 
 @router.patch(
@@ -31,6 +31,26 @@ class ProductsSchema(ProductBaseSchema):
     id: UUID
 
 
+class ProductsPageSchema(BaseModel):
+    items: list[ProductsSchema]
+    next_cursor: str | None = Field(description='Pass as "cursor" to get the next page; null on the last page.')
+
+
+class ProductFilterSchema(BaseModel):
+    category_id: UUID | None = None
+    min_price: Decimal | None = None
+    max_price: Decimal | None = None
+
+
 class ProductSchema(ProductsSchema):
     description: str
     created_at: datetime
+
+
+class ProductIdsSchema(BaseModel):
+    ids: Annotated[list[UUID], Field(min_length=1, max_length=1000)]
+
+
+class ProductPriceSchema(BaseModel):
+    id: UUID
+    price: Decimal
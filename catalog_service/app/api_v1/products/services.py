@@ -1,25 +1,116 @@
+import base64
+import binascii
+import logging
+from datetime import datetime
+from decimal import Decimal
 from uuid import UUID
 
-from fastapi import Depends, Path, HTTPException, status
+import orjson
+from fastapi import Depends, Request, Path, Query, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from cache import CachedResponse, cached
+from config import settings
 from db import get_db
 from models import Product
 from . import crud
-from .schemas import ProductCreateSchema, ProductUpdatePartialSchema
+from .schemas import (
+    ProductCreateSchema,
+    ProductUpdatePartialSchema,
+    ProductIdsSchema,
+    ProductPriceSchema,
+    ProductFilterSchema,
+    ProductsPageSchema,
+    ProductSchema,
+)
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_UPDATED = 'PRODUCT_UPDATED'
+
+PRODUCTS_LIST_CACHE = 'products:list'
+PRODUCT_CACHE = 'products:detail'
+
+
+async def publish_product_updated(request: Request, product_id: UUID, action: str) -> None:
+    """Notifies consumers holding product data (e.g. orders price cache) that the product changed."""
+    producer = getattr(request.app.state, 'producer', None)
+    if producer is None:
+        logger.warning(f'{PRODUCT_UPDATED} for product {product_id} not sent: AIOKafkaProducer is not initialized.')
+        return
+
+    message = {
+        'event': PRODUCT_UPDATED,
+        'product_id': str(product_id),
+        'action': action,
+    }
+    try:
+        await producer.send(topic=settings.kafka_product_update_topic, value=message)
+    except Exception as e:
+        logger.error(f'{PRODUCT_UPDATED} for product {product_id} not sent: {e}')
 
 
 async def create_product(
+        request: Request,
         product_data: ProductCreateSchema,
         session: AsyncSession = Depends(get_db),
 ) -> Product:
-    return await crud.create_product(session=session, data=product_data)
+    product = await crud.create_product(session=session, data=product_data)
+    await request.app.state.cache.invalidate(PRODUCTS_LIST_CACHE)
+    return product
+
+
+def encode_cursor(product: Product) -> str:
+    """Opaque page token with the (created_at, id) keyset of the last product on the page."""
+    raw = orjson.dumps([product.created_at.isoformat(), str(product.id)])
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
 
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        created_at, product_id = orjson.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(created_at), UUID(product_id)
+    except (binascii.Error, orjson.JSONDecodeError, TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Invalid cursor.',
+        )
 
+
+def get_product_filters(
+        category_id: UUID | None = Query(None),
+        min_price: Decimal | None = Query(None, ge=0),
+        max_price: Decimal | None = Query(None, ge=0),
+) -> ProductFilterSchema:
+    return ProductFilterSchema(category_id=category_id, min_price=min_price, max_price=max_price)
+
+
+def products_page_key(filters: ProductFilterSchema, limit: int, cursor: str | None, **_) -> str:
+    return f'{filters.category_id}:{filters.min_price}:{filters.max_price}:{limit}:{cursor}'
+
+
+@cached(PRODUCTS_LIST_CACHE, key=products_page_key, ttl=settings.redis.products_page_ttl)
 async def get_products(
+        request: Request,
+        filters: ProductFilterSchema = Depends(get_product_filters),
+        limit: int = Query(50, ge=1, le=500),
+        cursor: str | None = Query(None, description='"next_cursor" of the previous page.'),
         session: AsyncSession = Depends(get_db),
-) -> list[Product]:
-    return await crud.get_products(session=session)
+) -> CachedResponse:
+    """Page of products as serialized JSON; dropped from the cache on every product write."""
+    after = decode_cursor(cursor) if cursor else None
+
+    # One extra row tells whether there is a next page.
+    products: list[Product] = await crud.get_products(session=session, filters=filters, limit=limit + 1, after=after)
+    next_cursor = None
+    if len(products) > limit:
+        products = products[:limit]
+        next_cursor = encode_cursor(products[-1])
+
+    return CachedResponse.from_content(ProductsPageSchema.model_validate(
+        {'items': products, 'next_cursor': next_cursor},
+        from_attributes=True,
+    ).model_dump_json().encode('utf-8'))
 
 
 async def get_product_by_id(
@@ -35,16 +126,66 @@ async def get_product_by_id(
     )
 
 
+@cached(
+    PRODUCT_CACHE,
+    key=lambda product_id, **_: str(product_id),
+    negative_ttl=settings.redis.product_not_found_ttl,
+)
+async def load_product_detail(
+        request: Request,
+        product_id: UUID = Path(...),
+        session: AsyncSession = Depends(get_db),
+) -> CachedResponse | None:
+    """Product as serialized ProductSchema JSON; None (also cached, briefly) when it does not exist."""
+    product: Product | None = await crud.get_product(session=session, product_id=product_id)
+    if product is None:
+        return None
+    return CachedResponse.from_content(
+        ProductSchema.model_validate(product, from_attributes=True).model_dump_json().encode('utf-8')
+    )
+
+
+async def get_product_detail(
+        product_id: UUID = Path(...),
+        product: CachedResponse | None = Depends(load_product_detail),
+) -> CachedResponse:
+    if product:
+        return product
+    raise HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=f'Product {product_id} not found!',
+    )
+
+
+async def get_product_prices(
+        product_ids: ProductIdsSchema,
+        session: AsyncSession = Depends(get_db),
+) -> list[ProductPriceSchema]:
+    """Prices of the requested products. Unknown IDs are simply absent from the result."""
+    rows = await crud.get_product_prices(session=session, product_ids=list(set(product_ids.ids)))
+    return [ProductPriceSchema(id=product_id, price=price) for product_id, price in rows]
+
+
 async def update_product(
+        request: Request,
         product_data: ProductUpdatePartialSchema,
         product: Product = Depends(get_product_by_id),
         session: AsyncSession = Depends(get_db),
 ) -> Product:
-    return await crud.update_product(session=session, product=product, product_data=product_data, partial=True)
+    product = await crud.update_product(session=session, product=product, product_data=product_data, partial=True)
+    await request.app.state.cache.invalidate_key(PRODUCT_CACHE, str(product.id))
+    await request.app.state.cache.invalidate(PRODUCTS_LIST_CACHE)
+    await publish_product_updated(request=request, product_id=product.id, action='updated')
+    return product
 
 
 async def delete_product(
+        request: Request,
         product: Product = Depends(get_product_by_id),
         session: AsyncSession = Depends(get_db),
 ) -> None:
+    product_id = product.id
     await crud.delete_product(session=session, product=product)
+    await request.app.state.cache.invalidate_key(PRODUCT_CACHE, str(product_id))
+    await request.app.state.cache.invalidate(PRODUCTS_LIST_CACHE)
+    await publish_product_updated(request=request, product_id=product_id, action='deleted')
@@ -0,0 +1,467 @@
+"""
+Two-tier cache for catalog reads: an in-process LRU+TTL in front of Redis.
+
+Entries live in namespaces ("categories", "products:list", ...). Each namespace has a version
+in Redis that is part of every key; invalidating a namespace increments it and publishes the
+new version on a pub/sub channel, so every replica stops using its local entries at once and
+the old Redis keys simply expire. While the subscription is down the local tier is bypassed,
+as invalidations could be missed.
+
+Misses are loaded once: concurrent requests of a process wait for one load (single-flight),
+and across replicas a short Redis lock lets one load while the others serve the last value
+("stale" key) or wait for it. Entries are refreshed ahead of expiry with XFetch.
+
+Single entries can be dropped too (invalidate_key), and "not found" results can be cached
+for a short time (negative_ttl) so unknown ids do not reach the database on every request.
+"""
+import asyncio
+import functools
+import hashlib
+import logging
+import math
+import random
+import struct
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, ClassVar, Hashable
+
+import orjson
+from fastapi import Request, Response, status
+
+from config import settings
+from metrics import CACHE_REQUESTS, RedisWithMetrics
+
+logger = logging.getLogger(__name__)
+
+# Deletes the lock only if it still holds this request's token (it may have expired and been retaken).
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class FlightAbandoned(Exception):
+    """The request loading an entry for others was cancelled before the entry was loaded."""
+
+
+class LRUCache:
+    """In-process LRU cache whose entries also expire after "ttl" seconds."""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable) -> Any | None:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+def make_etag(content: bytes) -> str:
+    return f'"{hashlib.blake2b(content, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Weak comparison of If-None-Match, as GET/HEAD require (RFC 9110, 13.1.2)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return any(tag.strip().removeprefix('W/') == etag for tag in if_none_match.split(','))
+
+
+@dataclass(frozen=True, slots=True)
+class CachedResponse:
+    """Serialized JSON response body with its ETag; Redis keeps only the body."""
+
+    content: bytes
+    etag: str
+
+    @classmethod
+    def from_content(cls, content: bytes) -> 'CachedResponse':
+        return cls(content=content, etag=make_etag(content))
+
+    def to_response(self, request: Request) -> Response:
+        if etag_matches(request.headers.get('if-none-match'), self.etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={'ETag': self.etag})
+        return Response(content=self.content, media_type='application/json', headers={'ETag': self.etag})
+
+
+@dataclass(frozen=True, slots=True)
+class CacheEntry:
+    """
+    Cached value with what XFetch needs: how long it took to load and when it expires (unix time).
+    A None value ("not found") is stored with an empty body.
+    """
+
+    HEADER: ClassVar[struct.Struct] = struct.Struct('>dd')
+
+    value: CachedResponse | None
+    load_time: float
+    expires_at: float
+
+    def to_bytes(self) -> bytes:
+        content = self.value.content if self.value is not None else b''
+        return self.HEADER.pack(self.load_time, self.expires_at) + content
+
+    @classmethod
+    def from_bytes(cls, raw: bytes) -> 'CacheEntry':
+        load_time, expires_at = cls.HEADER.unpack_from(raw)
+        content = raw[cls.HEADER.size:]
+        return cls(
+            value=CachedResponse.from_content(content) if content else None,
+            load_time=load_time,
+            expires_at=expires_at,
+        )
+
+    def should_refresh(self, beta: float) -> bool:
+        """
+        XFetch (probabilistic early expiration): the closer to expiry and the slower to load,
+        the likelier one request reloads ahead of time, so replicas do not all miss at once.
+        """
+        return time.time() - self.load_time * beta * math.log(1.0 - random.random()) >= self.expires_at
+
+
+class TwoTierCache:
+    key_prefix = 'catalog:cache:'
+
+    def __init__(
+            self,
+            redis: RedisWithMetrics,
+            max_size: int,
+            ttl: float,
+            channel: str,
+            lock_ttl: float = 3.0,
+            lock_poll_interval: float = 0.05,
+            early_refresh_beta: float = 1.0,
+            retry_interval: float = 1.0,
+    ):
+        self.redis = redis
+        self.local = LRUCache(max_size=max_size, ttl=ttl)
+        self.channel = channel
+        self.lock_ttl = lock_ttl
+        self.lock_poll_interval = lock_poll_interval
+        self.early_refresh_beta = early_refresh_beta
+        self.retry_interval = retry_interval
+        # Namespace versions known to this replica; kept current by the invalidation channel.
+        self._versions: dict[str, int] = {}
+        self.subscribed = False
+        # Loads in progress in this process, by (namespace, key): concurrent misses wait for one.
+        self._flights: dict[tuple[str, str], asyncio.Future] = {}
+        self._delayed_drops: set[asyncio.Task] = set()
+
+    def _version_key(self, namespace: str) -> str:
+        return f'{self.key_prefix}{namespace}:version'
+
+    def _redis_key(self, namespace: str, version: int, key: str) -> str:
+        return f'{self.key_prefix}{namespace}:v{version}:{key}'
+
+    def _stale_key(self, namespace: str, key: str) -> str:
+        """Last loaded value of any version, served while another replica reloads the current one."""
+        return f'{self.key_prefix}{namespace}:stale:{key}'
+
+    async def _get_version(self, namespace: str) -> int:
+        version = self._versions.get(namespace) if self.subscribed else None
+        if version is not None:
+            return version
+        version_key = self._version_key(namespace)
+        raw = await self.redis.get(version_key)
+        if raw is None:
+            # Missing (first run or evicted): start from the current time, so no older key is reused.
+            await self.redis.set(version_key, int(time.time() * 1000), nx=True)
+            raw = await self.redis.get(version_key)
+        version = int(raw)
+        if self.subscribed:
+            self._versions[namespace] = max(version, self._versions.get(namespace, 0))
+        return version
+
+    async def get_or_load(
+            self,
+            namespace: str,
+            key: str,
+            load: Callable[[], Awaitable[CachedResponse | None]],
+            ttl: int,
+            negative_ttl: int | None = None,
+    ) -> CachedResponse | None:
+        """
+        Value from the local tier, then Redis, then "load" (stored in both tiers).
+        "load" returns None when there is nothing to serve; that is cached only with "negative_ttl".
+        """
+        entry = None
+        version = self._versions.get(namespace) if self.subscribed else None
+        if version is not None:
+            entry = self.local.get((namespace, version, key))
+            if entry is not None and not entry.should_refresh(self.early_refresh_beta):
+                CACHE_REQUESTS.labels(namespace=namespace, tier='local', result='hit').inc()
+                return entry.value
+        CACHE_REQUESTS.labels(namespace=namespace, tier='local', result='miss' if entry is None else 'refresh').inc()
+
+        flight_key = (namespace, key)
+        while (flight := self._flights.get(flight_key)) is not None:
+            if entry is not None:
+                # Being refreshed early: the current value is still valid.
+                return entry.value
+            try:
+                return await asyncio.shield(flight)
+            except FlightAbandoned:
+                # The loading request was cancelled, not this one: load here, or wait for whoever does.
+                continue
+
+        flight = asyncio.get_running_loop().create_future()
+        # Nobody may wait for it; do not log its exception as never retrieved.
+        flight.add_done_callback(lambda f: f.exception())
+        self._flights[flight_key] = flight
+        try:
+            value = await self._load_shared(
+                namespace=namespace,
+                key=key,
+                load=load,
+                ttl=ttl,
+                negative_ttl=negative_ttl,
+                flight=flight,
+            )
+        except Exception as e:
+            flight.set_exception(e)
+            raise
+        except BaseException:
+            # This request is cancelled (client gone, timeout) or the process is stopping:
+            # the waiting ones load on their own instead of sharing the abort or hanging.
+            flight.set_exception(FlightAbandoned())
+            raise
+        else:
+            flight.set_result(value)
+            return value
+        finally:
+            if self._flights.get(flight_key) is flight:
+                del self._flights[flight_key]
+
+    async def _load_shared(
+            self,
+            namespace: str,
+            key: str,
+            load: Callable[[], Awaitable[CachedResponse | None]],
+            ttl: int,
+            negative_ttl: int | None,
+            flight: asyncio.Future,
+    ) -> CachedResponse | None:
+        """Redis lookup, then "load" by at most one replica at a time; the others get stale data or wait."""
+        try:
+            version = await self._get_version(namespace)
+            redis_key = self._redis_key(namespace, version, key)
+            raw = await self.redis.get(redis_key)
+        except Exception as e:
+            logger.error(f'Cache {namespace}: Redis read failed: {e}')
+            return await load()
+
+        stale = None
+        if raw is not None:
+            entry = CacheEntry.from_bytes(raw)
+            self._set_local(namespace, version, key, entry)
+            if not entry.should_refresh(self.early_refresh_beta):
+                CACHE_REQUESTS.labels(namespace=namespace, tier='redis', result='hit').inc()
+                return entry.value
+            CACHE_REQUESTS.labels(namespace=namespace, tier='redis', result='refresh').inc()
+            stale = entry.value
+        else:
+            CACHE_REQUESTS.labels(namespace=namespace, tier='redis', result='miss').inc()
+
+        lock_key = f'{redis_key}:lock'
+        token = uuid.uuid4().hex
+        try:
+            locked = await self.redis.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000))
+        except Exception as e:
+            logger.error(f'Cache {namespace}: Redis lock failed: {e}')
+            locked = False
+        if not locked:
+            if stale is None:
+                stale = await self._get_stale(namespace=namespace, key=key)
+            if stale is not None:
+                CACHE_REQUESTS.labels(namespace=namespace, tier='redis', result='stale').inc()
+                return stale
+            entry = await self._wait_for(redis_key)
+            if entry is not None:
+                self._set_local(namespace, version, key, entry)
+                return entry.value
+            # The lock holder is slow or gone: load without the lock.
+
+        try:
+            started = time.monotonic()
+            value = await load()
+            entry_ttl = ttl if value is not None else negative_ttl
+            if entry_ttl is None or self._flights.get((namespace, key)) is not flight:
+                # Not cacheable, or invalidated while loading: the value may already be outdated.
+                return value
+            # "version" was read before loading: if the namespace was invalidated meanwhile,
+            # the value lands under the old version and is never read as current.
+            entry = CacheEntry(
+                value=value,
+                load_time=time.monotonic() - started,
+                expires_at=time.time() + entry_ttl,
+            )
+            try:
+                await self.redis.set(redis_key, entry.to_bytes(), ex=entry_ttl)
+                if value is not None:
+                    await self.redis.set(self._stale_key(namespace, key), value.content, ex=entry_ttl)
+            except Exception as e:
+                logger.error(f'Cache {namespace}: Redis write failed: {e}')
+            self._set_local(namespace, version, key, entry)
+            return value
+        finally:
+            if locked:
+                try:
+                    await self.redis.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+                except Exception as e:
+                    logger.error(f'Cache {namespace}: Redis lock not released, it expires in {self.lock_ttl}s: {e}')
+
+    async def _get_stale(self, namespace: str, key: str) -> CachedResponse | None:
+        try:
+            content = await self.redis.get(self._stale_key(namespace, key))
+        except Exception as e:
+            logger.error(f'Cache {namespace}: Redis read failed: {e}')
+            return None
+        return CachedResponse.from_content(content) if content is not None else None
+
+    async def _wait_for(self, redis_key: str) -> CacheEntry | None:
+        """Polls for the value another replica is loading, for as long as its lock may be held."""
+        deadline = time.monotonic() + self.lock_ttl
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.lock_poll_interval)
+            try:
+                raw = await self.redis.get(redis_key)
+            except Exception:
+                return None
+            if raw is not None:
+                return CacheEntry.from_bytes(raw)
+        return None
+
+    def _set_local(self, namespace: str, version: int, key: str, entry: CacheEntry) -> None:
+        if self.subscribed and self._versions.get(namespace) == version:
+            ttl = min(self.local.ttl, entry.expires_at - time.time())
+            self.local.set((namespace, version, key), entry, ttl=ttl)
+
+    async def invalidate(self, namespace: str) -> None:
+        """Drops the namespace in Redis and in the local tier of every replica."""
+        self._versions.pop(namespace, None)
+        try:
+            version = await self.redis.incr(self._version_key(namespace))
+            await self.redis.publish(self.channel, orjson.dumps({'namespace': namespace, 'version': version}))
+        except Exception as e:
+            logger.error(f'Cache {namespace}: invalidation failed, Redis entries expire on their own: {e}')
+
+    async def invalidate_key(self, namespace: str, key: str) -> None:
+        """
+        Drops one entry in Redis and in the local tier of every replica. Repeated after "lock_ttl",
+        for a load that read the data before the write and stored it after the first drop.
+        """
+        await self._drop_key(namespace=namespace, key=key)
+        task = asyncio.create_task(self._drop_key(namespace=namespace, key=key, delay=self.lock_ttl))
+        self._delayed_drops.add(task)
+        task.add_done_callback(self._delayed_drops.discard)
+
+    async def _drop_key(self, namespace: str, key: str, delay: float = 0) -> None:
+        if delay:
+            await asyncio.sleep(delay)
+        self._drop_local_key(namespace=namespace, key=key)
+        try:
+            version = await self._get_version(namespace)
+            await self.redis.delete(self._redis_key(namespace, version, key), self._stale_key(namespace, key))
+            await self.redis.publish(self.channel, orjson.dumps({'namespace': namespace, 'key': key}))
+        except Exception as e:
+            logger.error(f'Cache {namespace}: {key} not invalidated, it expires on its own: {e}')
+
+    def _drop_local_key(self, namespace: str, key: str) -> None:
+        version = self._versions.get(namespace)
+        if version is not None:
+            self.local.delete((namespace, version, key))
+        # A load in progress may return old data: later requests start their own.
+        self._flights.pop((namespace, key), None)
+
+    def _apply_invalidation(self, message: bytes) -> None:
+        invalidation = orjson.loads(message)
+        namespace = invalidation['namespace']
+        if 'key' in invalidation:
+            self._drop_local_key(namespace=namespace, key=invalidation['key'])
+            return
+        # Entries of older versions are no longer looked up and leave the LRU over time.
+        self._versions[namespace] = max(invalidation['version'], self._versions.get(namespace, 0))
+        # Loads started before the invalidation may return old data: later requests start their own.
+        for flight_key in [flight_key for flight_key in self._flights if flight_key[0] == namespace]:
+            del self._flights[flight_key]
+
+    def _reset_local(self) -> None:
+        self._versions.clear()
+        self.local.clear()
+
+    async def listen(self) -> None:
+        """Applies invalidations published by any replica; runs for the lifetime of the app."""
+        while True:
+            try:
+                async with self.redis.client.pubsub(ignore_subscribe_messages=True) as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    self._reset_local()
+                    self.subscribed = True
+                    logger.info(f'Cache: subscribed to {self.channel}.')
+                    async for message in pubsub.listen():
+                        if message['type'] == 'message':
+                            self._apply_invalidation(message['data'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f'Cache: invalidation channel lost, local tier bypassed: {e}')
+            finally:
+                self.subscribed = False
+                self._reset_local()
+            await asyncio.sleep(self.retry_interval)
+
+
+def cached(
+        namespace: str,
+        key: Callable[..., str] | None = None,
+        ttl: int | None = None,
+        negative_ttl: int | None = None,
+):
+    """
+    Caches a service function returning a CachedResponse, or None for "not found" (cached for
+    "negative_ttl" seconds when set). The function must take "request" and be called with keyword
+    arguments (as FastAPI does); "key" builds the entry key from them.
+    """
+    entry_ttl = settings.cache.redis_ttl if ttl is None else ttl
+
+    def decorator(func: Callable[..., Awaitable[CachedResponse | None]]):
+        @functools.wraps(func)
+        async def wrapper(**kwargs) -> CachedResponse | None:
+            cache: TwoTierCache = kwargs['request'].app.state.cache
+            return await cache.get_or_load(
+                namespace=namespace,
+                key=key(**kwargs) if key else '',
+                load=lambda: func(**kwargs),
+                ttl=entry_ttl,
+                negative_ttl=negative_ttl,
+            )
+
+        return wrapper
+
+    return decorator
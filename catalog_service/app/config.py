@@ -43,6 +43,18 @@ class RedisConfig(BaseModel):
     port: int
     db: int
     categories_ttl: int  # days
+    products_page_ttl: int = 300  # seconds; pages are also dropped on every product write
+    product_not_found_ttl: int = 30  # seconds an unknown product id is answered with 404 from the cache
+
+
+class CacheConfig(BaseModel):
+    max_size: int = 10_000  # entries kept in process memory
+    ttl: int = 60  # seconds, in-process tier
+    redis_ttl: int = 3600  # seconds, Redis tier, unless set per cached function
+    invalidation_channel: str = 'catalog:cache:invalidate'
+    lock_ttl: float = 3.0  # seconds one replica may spend reloading an entry before others load too
+    lock_poll_interval: float = 0.05  # seconds between checks for the entry another replica is loading
+    early_refresh_beta: float = 1.0  # XFetch: > 1 refreshes earlier, 0 disables early refresh
 
 
 class Settings(BaseSettings):
@@ -54,10 +66,12 @@ class Settings(BaseSettings):
     )
     api_v1_prefix: str = '/api/v1'
     kafka_broker: str
+    kafka_product_update_topic: str = 'update_product'
 
     auth_jwt: AuthJWT
     db: DatabaseConfig
     redis: RedisConfig
+    cache: CacheConfig = CacheConfig()
 
 
 settings = Settings()
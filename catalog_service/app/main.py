@@ -1,5 +1,8 @@
+import asyncio
+import json
 from contextlib import asynccontextmanager
 
+from aiokafka import AIOKafkaProducer
 from fastapi import FastAPI, Depends, Request
 from fastapi.responses import ORJSONResponse, JSONResponse
 from redis.asyncio import Redis
@@ -9,6 +12,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from api_v1 import router as api_v1_router
 from db import get_db
 from logging_config import setup_logger
+from cache import TwoTierCache
 from config import settings
 from metrics import metrics_middleware, metrics_endpoint, RedisWithMetrics
 
@@ -29,8 +33,39 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f'Failed to connect to Redis: {e}')
 
+    app.state.cache = TwoTierCache(
+        redis=app.state.redis,
+        max_size=settings.cache.max_size,
+        ttl=settings.cache.ttl,
+        channel=settings.cache.invalidation_channel,
+        lock_ttl=settings.cache.lock_ttl,
+        lock_poll_interval=settings.cache.lock_poll_interval,
+        early_refresh_beta=settings.cache.early_refresh_beta,
+    )
+    cache_listener = asyncio.create_task(app.state.cache.listen())
+
+    producer = AIOKafkaProducer(
+        bootstrap_servers=[settings.kafka_broker],
+        value_serializer=lambda v: json.dumps(v).encode('utf-8'),
+    )
+    try:
+        await producer.start()
+        app.state.producer = producer
+        logger.info('Successfully connected to AIOKafkaProducer.')
+    except Exception as e:
+        app.state.producer = None
+        logger.error(f'Could not connect to AIOKafkaProducer: {e}')
+
     yield
 
+    cache_listener.cancel()
+    await asyncio.gather(cache_listener, return_exceptions=True)
+
+    if app.state.producer:
+        await app.state.producer.flush()
+        await app.state.producer.stop()
+        logger.info('AIOKafkaProducer closed.')
+
     if app.state.redis:
         await app.state.redis.aclose()
         logger.info('Redis connection closed.')
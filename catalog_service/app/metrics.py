@@ -22,6 +22,12 @@ REDIS_OPS = Counter(
     labelnames=['operation', 'status'],
 )
 
+CACHE_REQUESTS = Counter(
+    name='cache_requests',
+    documentation='Cache lookups by namespace, tier (local, redis) and result (hit, miss, refresh, stale)',
+    labelnames=['namespace', 'tier', 'result'],
+)
+
 
 async def metrics_middleware(request: Request, call_next):
     if request.url.path.startswith('/metrics'):
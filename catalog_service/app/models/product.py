@@ -3,7 +3,7 @@ from datetime import datetime, timezone
 from decimal import Decimal
 from typing import TYPE_CHECKING
 
-from sqlalchemy import String, Text, Numeric, ForeignKey, DateTime, func
+from sqlalchemy import String, Text, Numeric, ForeignKey, DateTime, func, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from models import Base
@@ -14,6 +14,13 @@ if TYPE_CHECKING:
 
 class Product(Base):
     __tablename__ = 'products'
+    __table_args__ = (
+        # keyset pagination: ORDER BY created_at DESC, id DESC, optionally filtered by category_id
+        Index('ix_products_created_at_id', 'created_at', 'id'),
+        Index('ix_products_category_id_created_at_id', 'category_id', 'created_at', 'id'),
+        # price range filter
+        Index('ix_products_price', 'price'),
+    )
 
     name: Mapped[str] = mapped_column(String(200))
     description: Mapped[str] = mapped_column(Text)
@@ -21,7 +28,7 @@ class Product(Base):
     category_id: Mapped[uuid.UUID] = mapped_column(ForeignKey('categories.id'))
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
-        default=datetime.now(timezone.utc),
+        default=lambda: datetime.now(timezone.utc),
         server_default=func.now(),
     )
 
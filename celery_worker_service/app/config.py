@@ -7,6 +7,7 @@ class RedisConfig(BaseModel):
     port: int
     db: int
     rate_exp: int  # minutes
+    rate_stale: int = 10  # minutes a rate is still served after "rate_exp" while it is refreshed
 
     @property
     def redis_url(self) -> str:
@@ -0,0 +1,33 @@
+"""
+Currency rates snapshots in Redis. Kept identical in celery_worker_service and order_worker_service.
+
+Every API response is stored as an immutable hash "rates:{base}:v{ms}" {currency: rate}, and the
+pointer key "rates:{base}:current" names the latest one. A snapshot outlives its pointer,
+so a reader that resolved the pointer always finds the whole snapshot.
+"""
+import time
+from datetime import timedelta
+
+from config import settings
+
+
+def pointer_key(base_currency: str | None = None) -> str:
+    return f'rates:{base_currency or settings.exchange_api.base_currency}:current'
+
+
+def snapshot_key(version: int, base_currency: str | None = None) -> str:
+    return f'rates:{base_currency or settings.exchange_api.base_currency}:v{version}'
+
+
+def queue_rates_snapshot(pipe, base_currency: str, rates: dict[str, float]) -> str:
+    """
+    Queues a new snapshot and the pointer to it on a transactional pipeline (sync or asyncio),
+    which the caller executes. The pointer is fresh for "rate_exp", then stale for "rate_stale" minutes.
+    Returns the snapshot key.
+    """
+    pointer_ttl = timedelta(minutes=settings.redis.rate_exp + settings.redis.rate_stale)
+    new_snapshot_key = snapshot_key(version=time.time_ns() // 1_000_000, base_currency=base_currency)
+    pipe.hset(new_snapshot_key, mapping=rates)
+    pipe.expire(new_snapshot_key, pointer_ttl + timedelta(minutes=1))
+    pipe.set(pointer_key(base_currency), new_snapshot_key, ex=pointer_ttl)
+    return new_snapshot_key
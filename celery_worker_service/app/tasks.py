@@ -1,6 +1,5 @@
 import random
 import time
-from datetime import timedelta
 
 import requests
 
@@ -8,9 +7,13 @@ import redis_connect
 from celery_app import celery
 from config import settings
 from logging_config import setup_logger
+from rates_snapshot import queue_rates_snapshot
 
 logger = setup_logger('celery_worker_service')
 
+# order_worker_service refreshes its in-memory rate table on messages here.
+RATES_CHANNEL = 'rates:updated'
+
 
 @celery.task(name='tasks.update_currency_rate')
 def update_currency_rate() -> None:
@@ -24,28 +27,31 @@ def update_currency_rate() -> None:
 
     try:
         base_currency: str = settings.exchange_api.base_currency
-        target_currency: str = settings.exchange_api.target_currency
-        rate_key: str = f'rates:{base_currency}_{target_currency}'
 
         response: dict | None = fetch_currency_rate_from_api()
         if response is None:
             logger.error('Failed to fetch currency rate from API.')
             return
 
-        rate: float = response['rates'][target_currency]
-        logger.info(f'Fetched new rate from API: "{rate_key}" = {rate}')
+        rates: dict[str, float] = {currency: float(rate) for currency, rate in response['rates'].items()}
+        logger.info(f'Fetched new rates from API: "{base_currency}" = {rates}')
 
-        redis_connect.redis_client.set(
-            name=rate_key,
-            value=rate,
-            ex=timedelta(minutes=settings.redis.rate_exp),
-        )
-        logger.info(f'Successfully updated and cached currency rate for: "{rate_key}".')
+        snapshot_key: str = store_rates_snapshot(base_currency=base_currency, rates=rates)
+        redis_connect.redis_client.publish(RATES_CHANNEL, snapshot_key)
+        logger.info(f'Successfully updated and cached currency rates: "{snapshot_key}".')
 
     except Exception as e:
         logger.error(f'An error occurred during currency rate update: {e}', exc_info=True)
 
 
+def store_rates_snapshot(base_currency: str, rates: dict[str, float]) -> str:
+    """Writes the rates as a new snapshot and points the pointer key to it in one transaction."""
+    pipe = redis_connect.redis_client.pipeline(transaction=True)
+    snapshot_key: str = queue_rates_snapshot(pipe=pipe, base_currency=base_currency, rates=rates)
+    pipe.execute()
+    return snapshot_key
+
+
 def fetch_currency_rate_from_api(retries: int = 4, base_delay: float = 1.0) -> dict | None:
     """Makes HTTP request to the external API to retrieve the rate, with retry logic."""
 
@@ -1,11 +1,32 @@
+from typing import Literal
+
 from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
+class KafkaProducerConfig(BaseModel):
+    acks: int | Literal['all'] = 'all'
+    enable_idempotence: bool = True  # no duplicates on producer retries; requires acks='all'
+    linger_ms: int = 5  # wait for more messages to fill a batch
+    max_batch_size: int = 65536  # bytes per partition batch
+    compression_type: Literal['gzip', 'snappy', 'lz4', 'zstd'] | None = 'zstd'  # all but gzip need cramjam
+
+
 class KafkaConfig(BaseModel):
     broker: str
     order_create_topic: str
     order_update_topic: str
+    producer: KafkaProducerConfig = KafkaProducerConfig()
+    event_format: Literal['binary', 'json'] = 'binary'  # 'json' while consumers of the former format run
+    partitioner: Literal['murmur2', 'crc32'] = 'murmur2'  # maps message keys to partitions
+
+
+class RetryConfig(BaseModel):
+    max_attempts: int = 5  # retries before a message goes to the dead-letter topic
+    backoff_base_ms: int = 1000  # delay before the first retry, doubled for every next one
+    backoff_max_ms: int = 300000
+    retry_topic_suffix: str = '.retry'
+    dead_letter_topic_suffix: str = '.dlq'
 
 
 class RedisConfig(BaseModel):
@@ -13,6 +34,9 @@ class RedisConfig(BaseModel):
     port: int
     db: int
     rate_exp: int  # minutes
+    rate_stale: int = 10  # minutes a rate is still served after "rate_exp" while it is refreshed
+    rate_lock_timeout: int = 15  # seconds, lock that lets only one worker call the external API
+    rate_refresh_interval: int = 60  # seconds between in-memory rate table refreshes
 
     @property
     def redis_url(self) -> str:
@@ -27,6 +51,13 @@ class ExchangeAPIConfig(BaseModel):
     available_currency: str
 
 
+class PipelineConfig(BaseModel):
+    max_in_flight: int = 1000  # fetched messages not yet processed and committed
+    max_poll_records: int = 500  # max messages taken from Kafka at once
+    poll_timeout_ms: int = 1000
+    key_lanes: int = 4  # concurrent workers per partition; messages of one key stay in order
+
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
         env_file=('.env', '../.env'),
@@ -38,6 +69,8 @@ class Settings(BaseSettings):
     kafka: KafkaConfig
     redis: RedisConfig
     exchange_api: ExchangeAPIConfig
+    pipeline: PipelineConfig = PipelineConfig()
+    retry: RetryConfig = RetryConfig()
 
 
 settings = Settings()
@@ -1,66 +1,131 @@
 import asyncio
-import json
-from decimal import Decimal, ROUND_HALF_UP
 
-from aiokafka import AIOKafkaConsumer, AIOKafkaProducer
+from aiokafka import AIOKafkaConsumer, AIOKafkaProducer, ConsumerRecord
 from prometheus_client import start_http_server
 from redis.asyncio import Redis
 
+import events
 import redis_connect
 from config import settings
+from events import OrderCreated, OrderUpdated
 from logging_config import setup_logger
 from metrics import RedisWithMetrics, lag_watcher
-from utils import get_currency_rate
+from money import convert_minor_units
+from partitioners import PARTITIONERS
+from pipeline import PartitionPipeline
+from rates import rate_table, rate_refresher, refresh_rate_table
+from retries import retry_later, dead_letter, wait_until_due, retry_topic
+from serializers import serialize_event
+from utils import get_currency_rates
 
 logger = setup_logger('order_worker_service')
 
 
-async def process_message(message_data: dict, producer: AIOKafkaProducer) -> None:
-    order_id: str | None = message_data.get('order_id')
-    if order_id is None:
+async def get_rate(target_currency: str) -> float:
+    """Rate from the in-memory table; Redis or external API only when the table is cold or stale."""
+    rate: float | None = rate_table.get(target_currency)
+    if rate is None:
+        rates: dict[str, float] = await get_currency_rates()
+        # Re-read with the snapshot's real freshness: stale rates stay missing until refreshed.
+        await refresh_rate_table()
+        if target_currency not in rates:
+            raise RuntimeError(f'No {settings.exchange_api.base_currency}_{target_currency} rate in the rates snapshot.')
+        rate = rates[target_currency]
+    return rate
+
+
+def convert_orders(orders: list[OrderCreated], rate: float) -> list[OrderUpdated]:
+    """
+    Builds ORDER_UPDATED events for a batch of orders: all cart and delivery prices
+    are converted in one pass, in cents, rounded ROUND_HALF_UP.
+    """
+    amounts: list[int] = []
+    for order in orders:
+        amounts.append(order.cart_price)
+        amounts.append(order.delivery_price)
+
+    converted: list[int] = convert_minor_units(amounts=amounts, rate=rate)
+
+    update_events = []
+    for i, order in enumerate(orders):
+        cart_price_target: int = converted[2 * i]
+        delivery_price_target: int = converted[2 * i + 1]
+        update_events.append(OrderUpdated(
+            order_id=order.order_id,
+            cart_price=cart_price_target,
+            delivery_price=delivery_price_target,
+            total_price=cart_price_target + delivery_price_target,
+            status='updated',
+        ))
+    return update_events
+
+
+async def process_messages(records: list[ConsumerRecord], producer: AIOKafkaProducer) -> None:
+    """
+    Processes a chunk of one partition and waits until all its ORDER_UPDATED sends are acknowledged.
+    Malformed messages are dead-lettered; when the chunk cannot be converted (e.g. no currency rate)
+    its messages are scheduled for retry, so the partition moves on.
+    """
+    decoded: list[tuple[ConsumerRecord, OrderCreated]] = []
+    for msg in records:
+        try:
+            decoded.append((msg, events.decode(msg.value, expected=OrderCreated)))
+        except events.EventDecodeError as e:
+            await dead_letter(producer=producer, records=[msg], error=e)
+    if not decoded:
         return None
 
-    delivery_price: float = message_data.get('delivery_price', 0.0)
-    cart_price: float = message_data.get('cart_price', 0.0)
-
-    logger.info(f'Starting processing for order_id: {order_id}')
-    rate: float = await get_currency_rate(target_currency=settings.exchange_api.target_currency)
+    try:
+        rate: float = await get_rate(target_currency=settings.exchange_api.target_currency)
+        update_events = convert_orders(orders=[event for _, event in decoded], rate=rate)
+    except Exception as e:
+        await retry_later(producer=producer, records=[msg for msg, _ in decoded], error=e)
+        return None
 
-    delivery_price: Decimal = Decimal(str(delivery_price))
-    cart_price: Decimal = Decimal(str(cart_price))
-    rate: Decimal = Decimal(str(rate))
+    deliveries = []
+    for (msg, _), update_event in zip(decoded, update_events):
+        # The update keeps the key of its ORDER_CREATED, so all events of one key share a partition.
+        key: bytes = msg.key if msg.key is not None else str(update_event.order_id).encode('utf-8')
+        deliveries.append(await producer.send(
+            topic=settings.kafka.order_update_topic,
+            key=key,
+            value=serialize_event(update_event),
+        ))
 
-    delivery_price_target: Decimal = (delivery_price * rate).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-    cart_price_target: Decimal = (cart_price * rate).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-    total_price_target: Decimal = cart_price_target + delivery_price_target
+    await asyncio.gather(*deliveries)
+    logger.info(f'Order update data has been sent for {len(deliveries)} orders.')
 
-    update_message = {
-        'order_id': order_id,
-        'delivery_price': float(delivery_price_target),
-        'cart_price': float(cart_price_target),
-        'total_price': float(total_price_target),
-        'status': 'updated',
-    }
 
-    await producer.send(topic=settings.kafka.order_update_topic, value=update_message)
-    logger.info(f'Order update data has been sent (order_id: {order_id})')
+async def process_retry_messages(records: list[ConsumerRecord], producer: AIOKafkaProducer) -> None:
+    await wait_until_due(records)
+    await process_messages(records=records, producer=producer)
 
 
 async def main() -> None:
     lag_task = None
+    rates_task = None
+    pipeline = None
+    retry_pipeline = None
+    # Raw bytes in and out: values are (de)serialized per message, so one bad message cannot stop the consumer.
     producer = AIOKafkaProducer(
         bootstrap_servers=settings.kafka.broker,
-        value_serializer=lambda v: json.dumps(v).encode('utf-8'),
+        partitioner=PARTITIONERS[settings.kafka.partitioner],
         request_timeout_ms=10000,
+        **settings.kafka.producer.model_dump(),
     )
     consumer = AIOKafkaConsumer(
-        settings.kafka.order_create_topic,
         bootstrap_servers=settings.kafka.broker,
-        value_deserializer=lambda v: json.loads(v.decode('utf-8')),
         auto_offset_reset='earliest',
         enable_auto_commit=False,
         group_id='order_worker_group',
     )
+    # Own consumer and pipeline: messages waiting for their retry time never hold up new orders.
+    retry_consumer = AIOKafkaConsumer(
+        bootstrap_servers=settings.kafka.broker,
+        auto_offset_reset='earliest',
+        enable_auto_commit=False,
+        group_id='order_worker_retry_group',
+    )
     try:
         # Create Redis connection and save it in our redis_connect module.
         redis_instance = Redis(
@@ -76,20 +141,57 @@ async def main() -> None:
         except Exception as e:
             logger.error(f'Failed to connect to Redis: {e}')
 
+        rates_task = asyncio.create_task(rate_refresher())
+
+        pipeline = PartitionPipeline(
+            consumer=consumer,
+            handler=lambda records: process_messages(records=records, producer=producer),
+            max_in_flight=settings.pipeline.max_in_flight,
+            max_poll_records=settings.pipeline.max_poll_records,
+            poll_timeout_ms=settings.pipeline.poll_timeout_ms,
+            key_lanes=settings.pipeline.key_lanes,
+        )
+        consumer.subscribe(topics=[settings.kafka.order_create_topic], listener=pipeline)
+
+        retry_pipeline = PartitionPipeline(
+            consumer=retry_consumer,
+            handler=lambda records: process_retry_messages(records=records, producer=producer),
+            max_in_flight=settings.pipeline.max_in_flight,
+            max_poll_records=settings.pipeline.max_poll_records,
+            poll_timeout_ms=settings.pipeline.poll_timeout_ms,
+        )
+        retry_consumer.subscribe(topics=[retry_topic(settings.kafka.order_create_topic)], listener=retry_pipeline)
+
         await producer.start()
         await consumer.start()
-        logger.info('Kafka Consumer and Producer started.')
+        await retry_consumer.start()
+        logger.info('Kafka Consumers and Producer started.')
 
         lag_task = asyncio.create_task(lag_watcher(consumer))
 
-        async for msg in consumer:
-            await process_message(message_data=msg.value, producer=producer)
-            await consumer.commit()
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(pipeline.run())
+            tg.create_task(retry_pipeline.run())
 
     except Exception as e:
         logger.error(f'A critical error occurred: {e}', exc_info=True)
 
     finally:
+        if pipeline:
+            await pipeline.stop()
+            logger.info('Processing pipeline stopped.')
+
+        if retry_pipeline:
+            await retry_pipeline.stop()
+            logger.info('Retry pipeline stopped.')
+
+        if rates_task:
+            rates_task.cancel()
+            try:
+                await rates_task
+            except asyncio.CancelledError:
+                logger.info('Rate refresher task cancelled.')
+
         if lag_task:
             lag_task.cancel()
             try:
@@ -98,6 +200,7 @@ async def main() -> None:
                 logger.info('Lag watcher task cancelled.')
 
         await consumer.stop()
+        await retry_consumer.stop()
         await producer.stop()
         logger.info('Kafka clients stopped.')
 
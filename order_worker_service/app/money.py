@@ -0,0 +1,34 @@
+from decimal import Decimal
+
+
+def rate_to_fraction(rate: float | Decimal) -> tuple[int, int]:
+    """Exact rate as numerator / 10**n, taken from its shortest decimal representation."""
+    sign, digits, exponent = Decimal(str(rate)).as_tuple()
+    numerator = int(''.join(map(str, digits)))
+    if sign:
+        numerator = -numerator
+    if exponent >= 0:
+        return numerator * 10 ** exponent, 1
+    return numerator, 10 ** -exponent
+
+
+def convert_minor_units(amounts: list[int], rate: float | Decimal) -> list[int]:
+    """
+    Converts many amounts (in cents) with one rate using integer arithmetic only.
+    Gives exactly the result of
+    (Decimal(amount) / 100 * Decimal(str(rate))).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP) * 100.
+    """
+    numerator, denominator = rate_to_fraction(rate)
+    if denominator == 1:
+        return [amount * numerator for amount in amounts]
+
+    twice_denominator = 2 * denominator
+    converted = []
+    for amount in amounts:
+        product = amount * numerator
+        # ROUND_HALF_UP: halves are rounded away from zero.
+        if product >= 0:
+            converted.append((2 * product + denominator) // twice_denominator)
+        else:
+            converted.append(-((-2 * product + denominator) // twice_denominator))
+    return converted
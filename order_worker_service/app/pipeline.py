@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import zlib
+from typing import Awaitable, Callable
+
+from aiokafka import AIOKafkaConsumer, ConsumerRebalanceListener, ConsumerRecord, TopicPartition
+
+logger = logging.getLogger(__name__)
+
+BatchHandler = Callable[[list[ConsumerRecord]], Awaitable[None]]
+
+
+class PartitionPipeline(ConsumerRebalanceListener):
+    """
+    Processes every assigned partition in its own task: partitions are handled
+    concurrently, messages of one partition strictly in order.
+    Within a partition, a chunk is split into "key_lanes" lanes by message key and the lanes
+    are handled concurrently: messages of one key always share a lane and keep their order.
+    The offset of a chunk is committed only after "handler" has finished all its lanes,
+    so a handler must return only when its Kafka sends are acknowledged.
+    At most "max_in_flight" fetched messages wait for processing at any time.
+    """
+
+    def __init__(
+            self,
+            consumer: AIOKafkaConsumer,
+            handler: BatchHandler,
+            max_in_flight: int,
+            max_poll_records: int,
+            poll_timeout_ms: int,
+            key_lanes: int = 1,
+    ):
+        self.consumer = consumer
+        self.handler = handler
+        self.max_poll_records = min(max_poll_records, max_in_flight)
+        self.poll_timeout_ms = poll_timeout_ms
+        self.key_lanes = key_lanes
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._queues: dict[TopicPartition, asyncio.Queue[list[ConsumerRecord]]] = {}
+        self._workers: dict[TopicPartition, asyncio.Task] = {}
+        self._error: Exception | None = None
+
+    async def run(self) -> None:
+        while True:
+            if self._error is not None:
+                raise self._error
+
+            batches = await self.consumer.getmany(
+                timeout_ms=self.poll_timeout_ms,
+                max_records=self.max_poll_records,
+            )
+            for tp, records in batches.items():
+                for _ in records:
+                    await self._in_flight.acquire()
+                self._get_queue(tp).put_nowait(records)
+
+    async def stop(self) -> None:
+        await self._stop_workers(list(self._workers))
+
+    def _get_queue(self, tp: TopicPartition) -> asyncio.Queue[list[ConsumerRecord]]:
+        if tp not in self._queues:
+            self._queues[tp] = asyncio.Queue()
+            self._workers[tp] = asyncio.create_task(self._process_partition(tp))
+        return self._queues[tp]
+
+    async def _process_partition(self, tp: TopicPartition) -> None:
+        queue = self._queues[tp]
+        while True:
+            records = await queue.get()
+            try:
+                await self._handle(records)
+                await self.consumer.commit({tp: records[-1].offset + 1})
+            except Exception as e:
+                logger.error(f'Processing of {tp.topic}[{tp.partition}] failed: {e}', exc_info=True)
+                self._error = e
+                self._discard(queue)
+                return
+            finally:
+                for _ in records:
+                    self._in_flight.release()
+                queue.task_done()
+
+    async def _handle(self, records: list[ConsumerRecord]) -> None:
+        if self.key_lanes <= 1:
+            await self.handler(records)
+            return
+
+        lanes: dict[int, list[ConsumerRecord]] = {}
+        for record in records:
+            # Keyless messages share lane 0, so they stay in partition order.
+            lane = zlib.crc32(record.key) % self.key_lanes if record.key is not None else 0
+            lanes.setdefault(lane, []).append(record)
+
+        if len(lanes) == 1:
+            await self.handler(records)
+            return
+        try:
+            async with asyncio.TaskGroup() as tg:
+                for lane_records in lanes.values():
+                    tg.create_task(self.handler(lane_records))
+        except ExceptionGroup as eg:
+            raise eg.exceptions[0]
+
+    def _discard(self, queue: asyncio.Queue[list[ConsumerRecord]]) -> None:
+        """Drops not yet processed chunks: they are not committed and will be fetched again."""
+        while not queue.empty():
+            records = queue.get_nowait()
+            for _ in records:
+                self._in_flight.release()
+            queue.task_done()
+
+    async def _stop_workers(self, partitions: list[TopicPartition]) -> None:
+        for tp in partitions:
+            worker = self._workers.pop(tp, None)
+            queue = self._queues.pop(tp, None)
+            if worker is None:
+                continue
+            worker.cancel()
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
+            self._discard(queue)
+
+    async def on_partitions_revoked(self, revoked: list[TopicPartition]) -> None:
+        # Finish and commit what was already fetched before the partitions move to another consumer.
+        for tp in revoked:
+            queue = self._queues.get(tp)
+            worker = self._workers.get(tp)
+            if queue is not None and worker is not None and not worker.done():
+                await queue.join()
+        await self._stop_workers(list(revoked))
+
+    async def on_partitions_assigned(self, assigned: list[TopicPartition]) -> None:
+        pass
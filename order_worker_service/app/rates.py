@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import time
+
+from config import settings
+from rates_snapshot import pointer_key
+from redis_connect import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Celery worker publishes here after it caches new rates.
+RATES_CHANNEL = 'rates:updated'
+
+
+class RateTable:
+    """
+    In-memory currency rates of the latest Redis snapshot. A rate is treated as missing once
+    its snapshot is no longer fresh, so callers fall back to get_currency_rates(), which serves
+    stale rates while a single refresh runs. At most "max_age" seconds fresh.
+    """
+
+    def __init__(self, max_age: float):
+        self.max_age = max_age
+        self._rates: dict[str, tuple[float, float]] = {}  # currency -> (rate, fresh_until)
+
+    def get(self, currency: str) -> float | None:
+        entry = self._rates.get(currency)
+        if entry is None:
+            return None
+        rate, fresh_until = entry
+        if time.monotonic() >= fresh_until:
+            return None
+        return rate
+
+    def set(self, currency: str, rate: float, fresh_for: float) -> None:
+        self._rates[currency] = (rate, time.monotonic() + min(fresh_for, self.max_age))
+
+
+rate_table = RateTable(max_age=settings.redis.rate_exp * 60)
+
+
+async def read_rates_snapshot() -> tuple[dict[str, float], int] | None:
+    """
+    Latest rates snapshot and the PTTL (ms) of its pointer, or None when there is none.
+    Two round-trips, as the snapshot key is only known from the pointer (no key built in a script).
+    """
+    redis = await get_redis()
+    async with redis.client.pipeline(transaction=False) as pipe:
+        pipe.get(pointer_key())
+        pipe.pttl(pointer_key())
+        current_snapshot_key, ttl_ms = await pipe.execute()
+    if current_snapshot_key is None:
+        return None
+    fields = await redis.hgetall(current_snapshot_key)
+    if not fields:
+        return None
+    rates = {currency: float(rate) for currency, rate in fields.items()}
+    return rates, ttl_ms
+
+
+async def refresh_rate_table() -> None:
+    """Loads the rates of all currencies from the latest Redis snapshot."""
+    snapshot = await read_rates_snapshot()
+    if snapshot is None:
+        return
+    rates, ttl_ms = snapshot
+    # The pointer lives "rate_exp" + "rate_stale" minutes: its rates are fresh until its last "rate_stale".
+    if ttl_ms < 0:
+        fresh_for = rate_table.max_age
+    else:
+        fresh_for = ttl_ms / 1000 - settings.redis.rate_stale * 60
+    for currency, rate in rates.items():
+        rate_table.set(currency, rate, fresh_for=fresh_for)
+
+
+async def rate_refresher() -> None:
+    """
+    Keeps "rate_table" warm: refreshes it every "redis.rate_refresh_interval" seconds
+    and right after Celery worker announces new rates on RATES_CHANNEL.
+    """
+    redis = await get_redis()
+    pubsub = redis.client.pubsub()
+    try:
+        await pubsub.subscribe(RATES_CHANNEL)
+    except Exception as e:
+        logger.error(f'Could not subscribe to "{RATES_CHANNEL}": {e}')
+
+    try:
+        while True:
+            try:
+                await refresh_rate_table()
+            except Exception as e:
+                logger.error(f'Rate table refresh failed: {e}')
+
+            try:
+                await pubsub.get_message(
+                    ignore_subscribe_messages=True,
+                    timeout=settings.redis.rate_refresh_interval,
+                )
+            except Exception as e:
+                logger.error(f'Rate notifications unavailable: {e}')
+                await asyncio.sleep(settings.redis.rate_refresh_interval)
+    finally:
+        await pubsub.aclose()
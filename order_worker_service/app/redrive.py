@@ -0,0 +1,88 @@
+"""
+Re-drives dead-lettered messages back to their original topic with a fresh retry budget.
+Works for any "<topic>.dlq" written by retries.py (order_worker_service and orders_service).
+
+    python redrive.py create_order.dlq
+    python redrive.py update_order.dlq --limit 100
+    python redrive.py create_order.dlq --dry-run
+"""
+import argparse
+import asyncio
+import logging
+
+from aiokafka import AIOKafkaConsumer, AIOKafkaProducer
+
+from config import settings
+from partitioners import PARTITIONERS
+from retries import get_header, get_original_topic, ERROR_HEADER
+
+logger = logging.getLogger('redrive')
+
+
+async def redrive(dlq_topic: str, limit: int | None, dry_run: bool) -> int:
+    """
+    Sends up to "limit" messages (all when None) of "dlq_topic" that this tool has not re-driven yet.
+    Progress is stored as offsets of the "dlq_redrive" consumer group, so a message is re-driven once.
+    """
+    consumer = AIOKafkaConsumer(
+        dlq_topic,
+        bootstrap_servers=settings.kafka.broker,
+        group_id='dlq_redrive',
+        auto_offset_reset='earliest',
+        enable_auto_commit=False,
+    )
+    producer = AIOKafkaProducer(
+        bootstrap_servers=settings.kafka.broker,
+        # Same partitioner as the original producers: a re-driven message joins its key's partition.
+        partitioner=PARTITIONERS[settings.kafka.partitioner],
+        **settings.kafka.producer.model_dump(),
+    )
+    await consumer.start()
+    await producer.start()
+    redriven = 0
+    try:
+        while limit is None or redriven < limit:
+            max_records = 500 if limit is None else min(500, limit - redriven)
+            batches = await consumer.getmany(timeout_ms=2000, max_records=max_records)
+            if not batches:
+                break
+            for tp, records in batches.items():
+                deliveries = []
+                for record in records:
+                    original_topic = get_original_topic(record)
+                    error = get_header(record, ERROR_HEADER)
+                    logger.info(
+                        f'{tp.topic}[{tp.partition}]@{record.offset} -> {original_topic}'
+                        f' ({error.decode("utf-8", "replace") if error else "no error recorded"})'
+                    )
+                    if not dry_run:
+                        # No retry headers: the message gets the full retry budget again.
+                        deliveries.append(await producer.send(
+                            topic=original_topic,
+                            key=record.key,
+                            value=record.value,
+                        ))
+                await asyncio.gather(*deliveries)
+                if not dry_run:
+                    await consumer.commit({tp: records[-1].offset + 1})
+                redriven += len(records)
+    finally:
+        await consumer.stop()
+        await producer.stop()
+    return redriven
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('topic', help='Dead-letter topic, e.g. create_order.dlq')
+    parser.add_argument('--limit', type=int, help='Re-drive at most this many messages.')
+    parser.add_argument('--dry-run', action='store_true', help='Only list the messages; commit nothing.')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    count = asyncio.run(redrive(dlq_topic=args.topic, limit=args.limit, dry_run=args.dry_run))
+    logger.info(f'{"Listed" if args.dry_run else "Re-drove"} {count} messages.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Retry and dead-letter topics for messages that could not be processed.
+Kept identical in orders_service and order_worker_service.
+
+A failed message is re-published unchanged (raw bytes, same key) to "<topic>.retry" with headers:
+the attempt number, the time it is due again (exponential backoff) and the original topic.
+The retry topic consumer waits until a message is due and processes it like the original.
+After "retry.max_attempts" attempts, or at once when it can never succeed (malformed),
+the message goes to "<topic>.dlq"; redrive.py sends it back to the original topic.
+"""
+import asyncio
+import logging
+import time
+
+from aiokafka import AIOKafkaProducer, ConsumerRecord
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+ATTEMPT_HEADER = 'x-attempt'
+DUE_HEADER = 'x-due-ms'
+ORIGINAL_TOPIC_HEADER = 'x-original-topic'
+ERROR_HEADER = 'x-error'
+
+
+def retry_topic(topic: str) -> str:
+    return f'{topic}{settings.retry.retry_topic_suffix}'
+
+
+def dead_letter_topic(topic: str) -> str:
+    return f'{topic}{settings.retry.dead_letter_topic_suffix}'
+
+
+def get_header(record: ConsumerRecord, name: str) -> bytes | None:
+    for key, value in record.headers or ():
+        if key == name:
+            return value
+    return None
+
+
+def get_attempt(record: ConsumerRecord) -> int:
+    """Number of retries the message has already been through; 0 for a message from the original topic."""
+    attempt = get_header(record, ATTEMPT_HEADER)
+    return int(attempt) if attempt else 0
+
+
+def get_original_topic(record: ConsumerRecord) -> str:
+    original_topic = get_header(record, ORIGINAL_TOPIC_HEADER)
+    return original_topic.decode('utf-8') if original_topic else record.topic
+
+
+def backoff_ms(attempt: int) -> int:
+    return min(settings.retry.backoff_base_ms * 2 ** (attempt - 1), settings.retry.backoff_max_ms)
+
+
+def describe_error(error: Exception) -> bytes:
+    return f'{type(error).__name__}: {error}'[:1000].encode('utf-8')
+
+
+async def retry_later(producer: AIOKafkaProducer, records: list[ConsumerRecord], error: Exception) -> None:
+    """Schedules the records for another attempt, or dead-letters those out of attempts."""
+    deliveries = []
+    dead = []
+    for record in records:
+        attempt = get_attempt(record) + 1
+        if attempt > settings.retry.max_attempts:
+            dead.append(record)
+            continue
+        original_topic = get_original_topic(record)
+        due_ms = int(time.time() * 1000) + backoff_ms(attempt)
+        deliveries.append(await producer.send(
+            topic=retry_topic(original_topic),
+            key=record.key,
+            value=record.value,
+            headers=[
+                (ATTEMPT_HEADER, str(attempt).encode('utf-8')),
+                (DUE_HEADER, str(due_ms).encode('utf-8')),
+                (ORIGINAL_TOPIC_HEADER, original_topic.encode('utf-8')),
+                (ERROR_HEADER, describe_error(error)),
+            ],
+        ))
+    await asyncio.gather(*deliveries)
+    if deliveries:
+        logger.warning(f'{len(deliveries)} messages scheduled for retry: {error}')
+    if dead:
+        await dead_letter(producer=producer, records=dead, error=error)
+
+
+async def dead_letter(producer: AIOKafkaProducer, records: list[ConsumerRecord], error: Exception) -> None:
+    deliveries = []
+    for record in records:
+        original_topic = get_original_topic(record)
+        deliveries.append(await producer.send(
+            topic=dead_letter_topic(original_topic),
+            key=record.key,
+            value=record.value,
+            headers=[
+                (ATTEMPT_HEADER, str(get_attempt(record)).encode('utf-8')),
+                (ORIGINAL_TOPIC_HEADER, original_topic.encode('utf-8')),
+                (ERROR_HEADER, describe_error(error)),
+            ],
+        ))
+    await asyncio.gather(*deliveries)
+    logger.error(f'{len(deliveries)} messages dead-lettered: {error}')
+
+
+async def wait_until_due(records: list[ConsumerRecord]) -> None:
+    """Sleeps until every record of the chunk is due. Retry topic partitions are roughly in due order."""
+    due_ms = max(int(get_header(record, DUE_HEADER) or 0) for record in records)
+    delay = due_ms / 1000 - time.time()
+    if delay > 0:
+        await asyncio.sleep(delay)
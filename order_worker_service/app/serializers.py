@@ -0,0 +1,21 @@
+from typing import Any
+
+import orjson
+
+import events
+from config import settings
+
+
+def serialize_json(value: Any) -> bytes:
+    """Kafka value serializer: orjson, compact, UTF-8. Decimal must be converted by the caller."""
+    return orjson.dumps(value)
+
+
+def deserialize_json(raw: bytes) -> Any:
+    return orjson.loads(raw)
+
+
+def serialize_event(event: events.Event) -> bytes:
+    if settings.kafka.event_format == 'json':
+        return events.encode_json(event)
+    return events.encode(event)
@@ -1,49 +1,126 @@
 import asyncio
 import logging
 import random
-from datetime import timedelta
+import uuid
 
 import aiohttp
 from redis.asyncio import Redis
 
 from config import settings
+from rates import read_rates_snapshot
+from rates_snapshot import queue_rates_snapshot
 from redis_connect import get_redis
 
 logger = logging.getLogger(__name__)
 
 
+# Deletes the lock only if it still belongs to us (it may have expired and been taken by another worker).
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Rate refreshes running in this process: concurrent callers await the same one.
+_refreshes: dict[str, asyncio.Task] = {}
+
+
 async def get_currency_rate(target_currency: str = 'RUB') -> float:
+    """Retrieves the rate of one currency from the latest rates snapshot."""
+    rates: dict[str, float] = await get_currency_rates()
+    if target_currency not in rates:
+        raise RuntimeError(f'No {settings.exchange_api.base_currency}_{target_currency} rate in the rates snapshot.')
+    return rates[target_currency]
+
+
+async def get_currency_rates() -> dict[str, float]:
     """
-    Retrieves currency rate. First it searches in Redis,
+    Retrieves all currency rates. First it searches in Redis,
     if it doesn't find it, it accesses external API.
+    A snapshot in its last "redis.rate_stale" minutes is still returned,
+    while a single background refresh replaces it.
     """
-    redis: Redis = await get_redis()
+    base_currency: str = settings.exchange_api.base_currency
 
-    rate_key: str = f'rates:{settings.exchange_api.base_currency}_{target_currency}'
     # 1. Get from Redis
-    cached_rate: str | None = await redis.get(rate_key)
-    if cached_rate:
-        logger.info(f'Found currency rate in cache: {cached_rate}')
-        return float(cached_rate)
+    snapshot = await read_rates_snapshot()
+    if snapshot is not None:
+        rates, ttl_ms = snapshot
+        if ttl_ms < 0 or ttl_ms > settings.redis.rate_stale * 60 * 1000:
+            logger.info(f'Found currency rates in cache: {rates}')
+        else:
+            logger.info(f'Found stale currency rates in cache: {rates}, refreshing in background.')
+            refresh_currency_rates(base_currency=base_currency)
+        return rates
 
     # If not in Redis, get from external API
-    logger.info('No rate in cache, fetching from external API.')
+    logger.info('No rates in cache, fetching from external API.')
+    return await asyncio.shield(refresh_currency_rates(base_currency=base_currency))
 
+
+def refresh_currency_rates(base_currency: str) -> asyncio.Task:
+    """Starts a rates refresh, or returns the one already running in this process (single-flight)."""
+    task = _refreshes.get(base_currency)
+    if task is None:
+        task = asyncio.create_task(_refresh_currency_rates(base_currency=base_currency))
+        _refreshes[base_currency] = task
+        task.add_done_callback(lambda t: _on_refresh_done(base_currency=base_currency, task=t))
+    return task
+
+
+def _on_refresh_done(base_currency: str, task: asyncio.Task) -> None:
+    _refreshes.pop(base_currency, None)
+    # Background refreshes have nobody awaiting them: report their errors here.
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f'Currency rates refresh for {base_currency} failed: {task.exception()}')
+
+
+async def _refresh_currency_rates(base_currency: str) -> dict[str, float]:
+    """
+    Fetches the rates from external API and caches them in Redis. Across workers only
+    the holder of the Redis lock calls the API, the others wait for its result.
+    """
+    redis: Redis = await get_redis()
+
+    lock_key: str = f'rates:{base_currency}:lock'
+    lock_token: str = str(uuid.uuid4())
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.redis.rate_lock_timeout * 2
+
+    while loop.time() < deadline:
+        if await redis.set(name=lock_key, value=lock_token, nx=True, ex=settings.redis.rate_lock_timeout):
+            try:
+                return await _fetch_and_cache_rates(redis=redis, base_currency=base_currency)
+            finally:
+                await redis.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, lock_token)
+
+        # Another worker is fetching the rates: wait for a fresh snapshot to appear in Redis.
+        await asyncio.sleep(0.1)
+        snapshot = await read_rates_snapshot()
+        if snapshot is not None and snapshot[1] > settings.redis.rate_stale * 60 * 1000:
+            return snapshot[0]
+
+    raise RuntimeError(f'Timed out waiting for currency rates refresh ({base_currency}).')
+
+
+async def _fetch_and_cache_rates(redis: Redis, base_currency: str) -> dict[str, float]:
     response: dict | None = await fetch_currency_rate_from_api()
     if response is None:
         logger.error('External API returned no response')
         raise RuntimeError('Failed to fetch currency rate from external API.')
 
-    rate: float = response['rates'][target_currency]  # get rate from response
-    logger.info(f'Fetched new rate from API: {rate_key} = {rate}')
+    rates: dict[str, float] = {currency: float(rate) for currency, rate in response['rates'].items()}
+    logger.info(f'Fetched new rates from API: {base_currency} = {rates}')
+
+    await store_rates_snapshot(redis=redis, base_currency=base_currency, rates=rates)
+    return rates
+
 
-    # Set in Redis with expiration
-    await redis.set(
-        name=rate_key,
-        value=rate,
-        ex=timedelta(minutes=settings.redis.rate_exp),
-    )
-    return rate
+async def store_rates_snapshot(redis: Redis, base_currency: str, rates: dict[str, float]) -> None:
+    async with redis.client.pipeline(transaction=True) as pipe:
+        queue_rates_snapshot(pipe=pipe, base_currency=base_currency, rates=rates)
+        await pipe.execute()
 
 
 async def fetch_currency_rate_from_api(retries: int = 3, base_delay: float = 1.0) -> dict | None:
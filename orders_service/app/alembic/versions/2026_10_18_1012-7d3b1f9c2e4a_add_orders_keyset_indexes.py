@@ -0,0 +1,48 @@
+"""Add orders keyset pagination indexes
+
+Revision ID: 7d3b1f9c2e4a
+Revises: 215850378032
+Create Date: 2026-10-18 10:12:41.318205
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "7d3b1f9c2e4a"
+down_revision: Union[str, None] = "215850378032"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_orders_created_at_id",
+        "orders",
+        ["created_at", "id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_orders_user_id_created_at_id",
+        "orders",
+        ["user_id", "created_at", "id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_orders_status_created_at_id",
+        "orders",
+        ["status", "created_at", "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_orders_status_created_at_id", table_name="orders")
+    op.drop_index("ix_orders_user_id_created_at_id", table_name="orders")
+    op.drop_index("ix_orders_created_at_id", table_name="orders")
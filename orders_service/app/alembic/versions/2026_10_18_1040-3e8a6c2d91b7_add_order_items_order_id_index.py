@@ -0,0 +1,34 @@
+"""Add order_items order_id index
+
+Revision ID: 3e8a6c2d91b7
+Revises: 7d3b1f9c2e4a
+Create Date: 2026-10-18 10:40:12.584310
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3e8a6c2d91b7"
+down_revision: Union[str, None] = "7d3b1f9c2e4a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        op.f("ix_order_items_order_id"),
+        "order_items",
+        ["order_id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_order_items_order_id"), table_name="order_items")
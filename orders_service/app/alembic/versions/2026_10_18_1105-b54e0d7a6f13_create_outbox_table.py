@@ -0,0 +1,54 @@
+"""Create outbox table
+
+Revision ID: b54e0d7a6f13
+Revises: 3e8a6c2d91b7
+Create Date: 2026-10-18 11:05:27.913046
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b54e0d7a6f13"
+down_revision: Union[str, None] = "3e8a6c2d91b7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "outbox",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("topic", sa.String(length=255), nullable=False),
+        sa.Column("encoded_event", sa.LargeBinary(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column("sent_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_outbox")),
+    )
+    op.create_index(
+        "ix_outbox_unsent_created_at",
+        "outbox",
+        ["created_at"],
+        unique=False,
+        postgresql_where=sa.text("sent_at IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        "ix_outbox_unsent_created_at",
+        table_name="outbox",
+        postgresql_where=sa.text("sent_at IS NULL"),
+    )
+    op.drop_table("outbox")
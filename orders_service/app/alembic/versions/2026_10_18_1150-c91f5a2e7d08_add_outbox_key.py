@@ -0,0 +1,31 @@
+"""Add outbox message key
+
+Revision ID: c91f5a2e7d08
+Revises: b54e0d7a6f13
+Create Date: 2026-10-18 11:50:03.270418
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c91f5a2e7d08"
+down_revision: Union[str, None] = "b54e0d7a6f13"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "outbox", sa.Column("key", sa.String(length=255), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("outbox", "key")
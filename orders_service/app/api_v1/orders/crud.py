@@ -1,31 +1,107 @@
+from datetime import datetime
 from uuid import UUID
 
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Select, insert, select, update, values, column, literal, tuple_, Numeric, String, Uuid
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncScalarResult
+from sqlalchemy.orm import selectinload
 
-from models import Order
-from .schemas import OrderUpdateStatusSchema
+from models import Order, OrderItem, OutboxEvent
+from .schemas import OrderFilterSchema
 
 
-async def get_order(session: AsyncSession, order_id: UUID) -> Order | None:
-    return await session.get(Order, order_id)
+async def get_order(session: AsyncSession, order_id: UUID, with_items: bool = False) -> Order | None:
+    options = [selectinload(Order.items)] if with_items else []
+    return await session.get(Order, order_id, options=options)
 
 
-async def get_orders(session: AsyncSession) -> list[Order]:
+async def get_orders_with_items(session: AsyncSession, order_ids: list[UUID]) -> list[Order]:
+    """Orders by ids with their items: one query for orders and one IN query for all their items."""
     result = await session.scalars(
         select(Order)
-        .order_by(Order.created_at.desc())
+        .where(Order.id.in_(order_ids))
+        .options(selectinload(Order.items))
+        .order_by(Order.created_at.desc(), Order.id.desc())
     )
     return list(result.all())
 
 
-async def create_order(session: AsyncSession, order_data: dict) -> Order:
+def filter_orders(stmt: Select, filters: OrderFilterSchema) -> Select:
+    if filters.user_id is not None:
+        stmt = stmt.where(Order.user_id == filters.user_id)
+    if filters.status is not None:
+        stmt = stmt.where(Order.status == filters.status)
+    if filters.created_from is not None:
+        stmt = stmt.where(Order.created_at >= filters.created_from)
+    if filters.created_to is not None:
+        stmt = stmt.where(Order.created_at < filters.created_to)
+    return stmt
+
+
+async def get_orders(
+        session: AsyncSession,
+        filters: OrderFilterSchema,
+        limit: int,
+        after: tuple[datetime, UUID] | None = None,
+) -> list[Order]:
+    """Page of orders, newest first, strictly after the (created_at, id) keyset "after"."""
+    stmt = filter_orders(select(Order), filters=filters)
+    if after is not None:
+        created_at, order_id = after
+        stmt = stmt.where(
+            tuple_(Order.created_at, Order.id)
+            < tuple_(literal(created_at, Order.created_at.type), literal(order_id, Order.id.type))
+        )
+    result = await session.scalars(
+        stmt
+        .order_by(Order.created_at.desc(), Order.id.desc())
+        .limit(limit)
+    )
+    return list(result.all())
+
+
+async def stream_orders(
+        session: AsyncSession,
+        filters: OrderFilterSchema,
+        batch_size: int,
+) -> AsyncScalarResult[Order]:
+    """
+    Orders with their items through a server-side cursor, "batch_size" rows at a time.
+    Items are loaded with one IN query per batch.
+    """
+    return await session.stream_scalars(
+        filter_orders(select(Order), filters=filters)
+        .options(selectinload(Order.items))
+        .order_by(Order.created_at.desc(), Order.id.desc())
+        .execution_options(yield_per=batch_size)
+    )
+
+
+async def create_order(session: AsyncSession, order_data: dict, events_data: list[dict]) -> Order:
+    """Creates the order and its outbox events in one transaction."""
     order = Order(**order_data)
     session.add(order)
+    session.add_all([OutboxEvent(**event_data) for event_data in events_data])
     await session.commit()
     return order
 
 
+async def bulk_create_orders(
+        session: AsyncSession,
+        orders_data: list[dict],
+        items_data: list[dict],
+        events_data: list[dict],
+) -> None:
+    """
+    Inserts many orders, their items and outbox events in one transaction with multi-row
+    INSERT ... VALUES statements (executed in pages of "insertmanyvalues_page_size" rows).
+    Order ids must be set by the caller so that items can refer to them.
+    """
+    await session.execute(insert(Order), orders_data)
+    await session.execute(insert(OrderItem), items_data)
+    await session.execute(insert(OutboxEvent), events_data)
+    await session.commit()
+
+
 async def update_order(
         session: AsyncSession,
         order: Order,
@@ -37,6 +113,75 @@ async def update_order(
     return order
 
 
+async def apply_order_update(session: AsyncSession, order_data: dict) -> bool:
+    """
+    Idempotent ORDER_UPDATED: UPDATE orders SET ... WHERE id = :id AND status <> :status RETURNING id.
+    Returns False when the order is missing or already has the status (redelivered event).
+    """
+    result = await session.execute(
+        update(Order)
+        .where(Order.id == order_data['id'], Order.status != order_data['status'])
+        .values(
+            delivery_price=order_data['delivery_price'],
+            cart_price=order_data['cart_price'],
+            total_price=order_data['total_price'],
+            status=order_data['status'],
+        )
+        .returning(Order.id)
+        .execution_options(synchronize_session=False)
+    )
+    applied = result.scalar_one_or_none() is not None
+    await session.commit()
+    return applied
+
+
+async def bulk_update_orders(session: AsyncSession, orders_data: list[dict]) -> set[UUID]:
+    """
+    Applies many order updates with a single statement in one transaction:
+    UPDATE orders SET ... FROM (VALUES ...) AS order_updates
+    WHERE orders.id = order_updates.id AND orders.status <> order_updates.status RETURNING orders.id
+    Orders that already have the new status are skipped, so replaying a batch changes nothing.
+    Returns the ids of the updated orders.
+    """
+    order_updates = values(
+        column('id', Uuid),
+        column('delivery_price', Numeric(10, 2)),
+        column('cart_price', Numeric(10, 2)),
+        column('total_price', Numeric(10, 2)),
+        column('status', String(20)),
+        name='order_updates',
+    ).data([
+        (
+            order_data['id'],
+            order_data['delivery_price'],
+            order_data['cart_price'],
+            order_data['total_price'],
+            order_data['status'],
+        )
+        for order_data in orders_data
+    ])
+    result = await session.execute(
+        update(Order)
+        .where(Order.id == order_updates.c.id, Order.status != order_updates.c.status)
+        .values(
+            delivery_price=order_updates.c.delivery_price,
+            cart_price=order_updates.c.cart_price,
+            total_price=order_updates.c.total_price,
+            status=order_updates.c.status,
+        )
+        .returning(Order.id)
+        .execution_options(synchronize_session=False)
+    )
+    applied = set(result.scalars().all())
+    await session.commit()
+    return applied
+
+
+async def get_existing_order_ids(session: AsyncSession, order_ids: list[UUID]) -> set[UUID]:
+    result = await session.scalars(select(Order.id).where(Order.id.in_(order_ids)))
+    return set(result.all())
+
+
 async def delete_order(session: AsyncSession, order: Order) -> None:
     await session.delete(order)
     await session.commit()
@@ -1,9 +1,16 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, status
+from fastapi.responses import StreamingResponse
 
 from models import Order
 from permissions import permission_required
 from . import services
-from .schemas import OrderSchema, OrdersSchema
+from .schemas import (
+    OrderSchema,
+    OrdersPageSchema,
+    OrderFilterSchema,
+    OrderWithItemsSchema,
+    BulkOrdersCreatedSchema,
+)
 from .services import create_order
 
 router = APIRouter(prefix='/orders', tags=['Orders'])
@@ -19,19 +26,53 @@ async def create_order(
     return order
 
 
+@router.post(
+    '/bulk',
+    response_model=BulkOrdersCreatedSchema,
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_orders_bulk(
+        orders: dict = Depends(services.create_orders_bulk),
+):
+    return orders
+
+
 @router.get(
     '',
-    response_model=list[OrdersSchema],
+    response_model=OrdersPageSchema,
     dependencies=[Depends(permission_required('orders_read'))],
 )
 async def get_orders(
-        orders: list[Order] = Depends(services.get_orders),
+        page: dict = Depends(services.get_orders),
+):
+    return page
+
+
+@router.get(
+    '/export',
+    response_class=StreamingResponse,
+    dependencies=[Depends(permission_required('orders_read'))],
+)
+async def export_orders(
+        filters: OrderFilterSchema = Depends(services.get_order_filters),
+        export_format: str = Query('ndjson', alias='format', pattern='^(ndjson|csv)$'),
+) -> StreamingResponse:
+    return services.export_orders(filters=filters, export_format=export_format)
+
+
+@router.get(
+    '/details',
+    response_model=list[OrderWithItemsSchema],
+    dependencies=[Depends(permission_required('orders_read'))],
+)
+async def get_orders_with_items(
+        orders: list[Order] = Depends(services.get_orders_with_items),
 ):
     return orders
 
 
 @router.get(
-    '/{id}',
+    '/{order_id}',
     response_model=OrderSchema,
     dependencies=[Depends(permission_required('order_read'))],
 )
@@ -41,8 +82,19 @@ async def get_order(
     return order
 
 
+@router.get(
+    '/{order_id}/details',
+    response_model=OrderWithItemsSchema,
+    dependencies=[Depends(permission_required('order_read'))],
+)
+async def get_order_with_items(
+        order: Order = Depends(services.get_order_with_items_by_id),
+):
+    return order
+
+
 @router.patch(
-    '/{id}',
+    '/{order_id}',
     response_model=OrderSchema,
     dependencies=[Depends(permission_required('order_update'))],
 )
@@ -53,7 +105,7 @@ async def update_order_status(
 
 
 @router.delete(
-    '/{id}',
+    '/{order_id}',
     status_code=status.HTTP_204_NO_CONTENT,
     dependencies=[
         Depends(permission_required('order_delete')),
@@ -10,6 +10,15 @@ class OrderCreateSchema(BaseModel):
     quantity: int
 
 
+class BulkOrderSchema(BaseModel):
+    user_id: UUID
+    items: list[OrderCreateSchema] = Field(min_length=1)
+
+
+class BulkOrdersCreatedSchema(BaseModel):
+    order_ids: list[UUID]
+
+
 class OrderUpdateStatusSchema(BaseModel):
     status: str = Field(example='paid')
 
@@ -21,6 +30,18 @@ class OrdersSchema(BaseModel):
     status: str
 
 
+class OrdersPageSchema(BaseModel):
+    items: list[OrdersSchema]
+    next_cursor: str | None = Field(description='Pass as "cursor" to get the next page; null on the last page.')
+
+
+class OrderFilterSchema(BaseModel):
+    user_id: UUID | None = None
+    status: str | None = None
+    created_from: datetime | None = None
+    created_to: datetime | None = None
+
+
 class OrderSchema(OrdersSchema):
     cart_price: Decimal
     delivery_price: Decimal
@@ -31,6 +52,10 @@ class ProductDataSchema(BaseModel):
     price: Decimal
 
 
+class ProductPriceSchema(ProductDataSchema):
+    id: UUID
+
+
 class OrderItemSchema(BaseModel):
     product_id: UUID
     quantity: int
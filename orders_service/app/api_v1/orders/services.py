@@ -1,39 +1,78 @@
+import base64
+import binascii
+import csv
+import io
 import logging
+from collections.abc import AsyncIterator
+from datetime import datetime
 from decimal import Decimal
-from uuid import UUID
+from uuid import UUID, uuid4
 
-from aiokafka import AIOKafkaProducer
-from fastapi import Depends, HTTPException, status, Path
+import aiohttp
+import orjson
+from aiokafka import AIOKafkaProducer, ConsumerRecord
+from fastapi import Body, Depends, HTTPException, status, Path, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
+import events
+from cache import ProductCache
 from config import settings
-from connections import get_producer
+from connections import get_http_session, get_product_cache
 from db import get_db, async_session
+from metrics import ORDER_UPDATES
 from models import Order, OrderItem
 from permissions import permission_required
-from utils import fetch_product_data
+from retries import retry_later, dead_letter, wait_until_due
+from utils import fetch_cart_products_data
 from . import crud
-from .schemas import OrderCreateSchema, ProductDataSchema, OrderUpdateStatusSchema
+from .schemas import (
+    OrderCreateSchema,
+    ProductDataSchema,
+    OrderUpdateStatusSchema,
+    OrderFilterSchema,
+    BulkOrderSchema,
+)
 
 logger = logging.getLogger(__name__)
 
+DELIVERY_PRICE = Decimal('5.00')
+
+
+def order_created_event(order_data: dict) -> dict:
+    """Outbox row of the ORDER_CREATED event; the outbox relay publishes it."""
+    event = events.OrderCreated(
+        order_id=order_data['id'],
+        cart_price=events.to_minor_units(order_data['cart_price']),
+        delivery_price=events.to_minor_units(order_data['delivery_price']),
+    )
+    return {
+        'topic': settings.kafka.order_create_topic,
+        'key': str(order_data['user_id'] if settings.kafka.partition_key == 'user_id' else order_data['id']),
+        'encoded_event': events.encode(event),
+    }
+
 
 async def create_order(
         products_list: list[OrderCreateSchema],
-        producer: AIOKafkaProducer = Depends(get_producer),
+        http_session: aiohttp.ClientSession = Depends(get_http_session),
+        product_cache: ProductCache = Depends(get_product_cache),
         payload: dict = Depends(permission_required('order_create')),
         session: AsyncSession = Depends(get_db),
 ) -> dict[str, str]:
     order_items = []
     cart_price = Decimal('0.00')
 
-    for product in products_list:
-        # get price from Product
-        product_data: ProductDataSchema = await fetch_product_data(
-            product_id=product.product_id,
-            token=payload['token'],
-        )
+    # get prices of all cart products from Product
+    products_data: dict[UUID, ProductDataSchema] = await fetch_cart_products_data(
+        product_ids=[product.product_id for product in products_list],
+        token=payload['token'],
+        session=http_session,
+        cache=product_cache,
+    )
 
+    for product in products_list:
+        product_data: ProductDataSchema = products_data[product.product_id]
         order_item = OrderItem(
             product_id=product.product_id,
             quantity=product.quantity,
@@ -42,10 +81,11 @@ async def create_order(
         order_items.append(order_item)
         cart_price += order_item.quantity * order_item.unit_price
 
-    delivery_price = Decimal('5.00')
+    delivery_price = DELIVERY_PRICE
     total_price = cart_price + delivery_price
 
     new_order = {
+        'id': uuid4(),
         'user_id': payload['sub'],
         'total_price': total_price,
         'cart_price': cart_price,
@@ -54,24 +94,183 @@ async def create_order(
         'items': order_items,
     }
 
-    order = await crud.create_order(session=session, order_data=new_order)
+    order = await crud.create_order(
+        session=session,
+        order_data=new_order,
+        events_data=[order_created_event(new_order)],
+    )
     if not order:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Could not create order.')
 
-    message = {
-        'order_id': str(order.id),
-        'delivery_price': float(order.delivery_price),
-        'cart_price': float(order.cart_price),
-    }
-    await producer.send(topic=settings.kafka.order_create_topic, value=message)
-
     return {'message': 'Your order has been accepted for processing.'}
 
 
+async def create_orders_bulk(
+        orders_list: list[BulkOrderSchema] = Body(..., min_length=1, max_length=settings.bulk_max_orders),
+        http_session: aiohttp.ClientSession = Depends(get_http_session),
+        product_cache: ProductCache = Depends(get_product_cache),
+        payload: dict = Depends(permission_required('orders_create')),
+        session: AsyncSession = Depends(get_db),
+) -> dict[str, list[UUID]]:
+    """
+    Creates many orders (e.g. B2B or marketplace imports) in one transaction
+    together with their ORDER_CREATE outbox events.
+    """
+    products_data: dict[UUID, ProductDataSchema] = await fetch_cart_products_data(
+        product_ids=[item.product_id for order in orders_list for item in order.items],
+        token=payload['token'],
+        session=http_session,
+        cache=product_cache,
+    )
+
+    orders_data = []
+    items_data = []
+    for order in orders_list:
+        order_id = uuid4()
+        cart_price = Decimal('0.00')
+        for item in order.items:
+            unit_price = Decimal(products_data[item.product_id].price)
+            items_data.append({
+                'id': uuid4(),
+                'order_id': order_id,
+                'product_id': item.product_id,
+                'quantity': item.quantity,
+                'unit_price': unit_price,
+            })
+            cart_price += item.quantity * unit_price
+
+        orders_data.append({
+            'id': order_id,
+            'user_id': order.user_id,
+            'total_price': cart_price + DELIVERY_PRICE,
+            'cart_price': cart_price,
+            'delivery_price': DELIVERY_PRICE,
+            'status': 'processing',
+        })
+
+    await crud.bulk_create_orders(
+        session=session,
+        orders_data=orders_data,
+        items_data=items_data,
+        events_data=[order_created_event(order_data) for order_data in orders_data],
+    )
+
+    return {'order_ids': [order_data['id'] for order_data in orders_data]}
+
+
+def encode_cursor(order: Order) -> str:
+    """Opaque page token with the (created_at, id) keyset of the last order on the page."""
+    raw = orjson.dumps([order.created_at.isoformat(), str(order.id)])
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        created_at, order_id = orjson.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(created_at), UUID(order_id)
+    except (binascii.Error, orjson.JSONDecodeError, TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Invalid cursor.',
+        )
+
+
+def get_order_filters(
+        user_id: UUID | None = Query(None),
+        order_status: str | None = Query(None, alias='status'),
+        created_from: datetime | None = Query(None, description='Inclusive lower bound of "created_at".'),
+        created_to: datetime | None = Query(None, description='Exclusive upper bound of "created_at".'),
+) -> OrderFilterSchema:
+    return OrderFilterSchema(
+        user_id=user_id,
+        status=order_status,
+        created_from=created_from,
+        created_to=created_to,
+    )
+
+
 async def get_orders(
+        filters: OrderFilterSchema = Depends(get_order_filters),
+        limit: int = Query(50, ge=1, le=500),
+        cursor: str | None = Query(None, description='"next_cursor" of the previous page.'),
         session: AsyncSession = Depends(get_db),
-) -> list[Order]:
-    return await crud.get_orders(session=session)
+) -> dict:
+    after = decode_cursor(cursor) if cursor else None
+    # One extra row tells whether there is a next page.
+    orders: list[Order] = await crud.get_orders(session=session, filters=filters, limit=limit + 1, after=after)
+
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        next_cursor = encode_cursor(orders[-1])
+    return {'items': orders, 'next_cursor': next_cursor}
+
+
+EXPORT_CSV_HEADER = (
+    'order_id', 'user_id', 'status', 'created_at', 'cart_price', 'delivery_price', 'total_price',
+    'product_id', 'quantity', 'unit_price',
+)
+
+
+def order_to_ndjson(order: Order) -> bytes:
+    return orjson.dumps({
+        'id': str(order.id),
+        'user_id': str(order.user_id),
+        'status': order.status,
+        'created_at': order.created_at.isoformat(),
+        'cart_price': str(order.cart_price),
+        'delivery_price': str(order.delivery_price),
+        'total_price': str(order.total_price),
+        'items': [
+            {
+                'product_id': str(item.product_id),
+                'quantity': item.quantity,
+                'unit_price': str(item.unit_price),
+            }
+            for item in order.items
+        ],
+    }) + b'\n'
+
+
+def orders_to_csv(orders: list[Order]) -> bytes:
+    """One row per order item; an order without items takes one row with empty item columns."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for order in orders:
+        order_row = (
+            order.id, order.user_id, order.status, order.created_at.isoformat(),
+            order.cart_price, order.delivery_price, order.total_price,
+        )
+        if not order.items:
+            writer.writerow(order_row + ('', '', ''))
+        for item in order.items:
+            writer.writerow(order_row + (item.product_id, item.quantity, item.unit_price))
+    return buffer.getvalue().encode('utf-8')
+
+
+async def stream_orders_export(filters: OrderFilterSchema, export_format: str) -> AsyncIterator[bytes]:
+    # Own session: dependency sessions are closed before a streaming response body is sent.
+    async with async_session() as session:
+        if export_format == 'csv':
+            buffer = io.StringIO()
+            csv.writer(buffer).writerow(EXPORT_CSV_HEADER)
+            yield buffer.getvalue().encode('utf-8')
+
+        result = await crud.stream_orders(session=session, filters=filters, batch_size=settings.export_batch_size)
+        async for orders in result.partitions():
+            if export_format == 'csv':
+                yield orders_to_csv(orders)
+            else:
+                yield b''.join(order_to_ndjson(order) for order in orders)
+
+
+def export_orders(filters: OrderFilterSchema, export_format: str) -> StreamingResponse:
+    media_type = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    return StreamingResponse(
+        content=stream_orders_export(filters=filters, export_format=export_format),
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="orders.{export_format}"'},
+    )
 
 
 async def get_order_by_id(
@@ -87,6 +286,27 @@ async def get_order_by_id(
     )
 
 
+async def get_order_with_items_by_id(
+        order_id: UUID = Path(...),
+        session: AsyncSession = Depends(get_db),
+) -> Order:
+    order: Order | None = await crud.get_order(session=session, order_id=order_id, with_items=True)
+    if order:
+        return order
+    raise HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=f'Order {order_id} not found!',
+    )
+
+
+async def get_orders_with_items(
+        order_ids: list[UUID] = Query(..., alias='ids', min_length=1, max_length=settings.details_max_ids),
+        session: AsyncSession = Depends(get_db),
+) -> list[Order]:
+    """Orders with items for all requested ids; ids of missing orders are skipped."""
+    return await crud.get_orders_with_items(session=session, order_ids=list(dict.fromkeys(order_ids)))
+
+
 async def update_order_status(
         order_data: OrderUpdateStatusSchema,
         order: Order = Depends(get_order_by_id),
@@ -106,26 +326,96 @@ async def delete_order(
     await crud.delete_order(session=session, order=order)
 
 
-async def process_message(message_data: dict) -> None:
-    order_id: str | None = message_data.get('order_id')
-    if order_id is None:
+def order_update_data(event: events.OrderUpdated) -> dict:
+    return {
+        'id': event.order_id,
+        'delivery_price': events.minor_units_to_decimal(event.delivery_price),
+        'cart_price': events.minor_units_to_decimal(event.cart_price),
+        'total_price': events.minor_units_to_decimal(event.total_price),
+        'status': event.status,
+    }
+
+
+async def count_order_updates(session: AsyncSession, order_ids: list[UUID], applied: set[UUID]) -> None:
+    """Counts applied updates; tells duplicates from missing orders only when something was not applied."""
+    ORDER_UPDATES.labels(result='applied').inc(len(applied))
+    not_applied = [order_id for order_id in order_ids if order_id not in applied]
+    if not not_applied:
         return None
 
-    update_order_data = {
-        'delivery_price': message_data['delivery_price'],
-        'cart_price': message_data['cart_price'],
-        'total_price': message_data['total_price'],
-        'status': message_data['status'],
-    }
+    existing: set[UUID] = await crud.get_existing_order_ids(session=session, order_ids=not_applied)
+    missing = [order_id for order_id in not_applied if order_id not in existing]
+    ORDER_UPDATES.labels(result='duplicate').inc(len(existing))
+    ORDER_UPDATES.labels(result='missing').inc(len(missing))
+    if missing:
+        logger.error(f'Orders not found, updates skipped: {", ".join(map(str, missing))}')
 
-    async with async_session() as session:
-        order: Order | None = await crud.get_order(session=session, order_id=UUID(order_id))
-        if order is None:
-            logger.error(f'Order {order_id} not found! Create order process not finished!')
 
-        await crud.update_order(
+async def process_message(update_event: events.OrderUpdated) -> None:
+    """Applies one ORDER_UPDATED event with a single idempotent UPDATE."""
+    async with async_session() as session:
+        applied: bool = await crud.apply_order_update(session=session, order_data=order_update_data(update_event))
+        await count_order_updates(
             session=session,
-            order=order,
-            order_data=update_order_data,
+            order_ids=[update_event.order_id],
+            applied={update_event.order_id} if applied else set(),
         )
-        logger.info(f'Order {order_id} successfully updated!')
+    if applied:
+        logger.info(f'Order {update_event.order_id} successfully updated!')
+
+
+async def process_product_message(message_data: dict, product_cache: ProductCache) -> None:
+    if message_data.get('event') != 'PRODUCT_UPDATED':
+        return None
+
+    product_id: str | None = message_data.get('product_id')
+    if product_id is None:
+        return None
+
+    await product_cache.invalidate(product_id=UUID(product_id))
+    logger.info(f'Product {product_id} removed from cache ({message_data.get("action")}).')
+
+
+async def process_messages(update_events: list[events.OrderUpdated]) -> None:
+    """Applies a batch of ORDER_UPDATED events in one transaction; redelivered events change nothing."""
+    # Only the latest update of each order in the batch matters.
+    orders_data: dict[UUID, dict] = {event.order_id: order_update_data(event) for event in update_events}
+    if not orders_data:
+        return None
+
+    async with async_session() as session:
+        applied: set[UUID] = await crud.bulk_update_orders(session=session, orders_data=list(orders_data.values()))
+        await count_order_updates(session=session, order_ids=list(orders_data), applied=applied)
+    logger.info(f'{len(applied)} of {len(orders_data)} orders updated.')
+
+
+async def process_update_records(records: list[ConsumerRecord], producer: AIOKafkaProducer) -> None:
+    """
+    Applies ORDER_UPDATED records with per-message error isolation: malformed messages are dead-lettered;
+    when the batch transaction fails, updates are applied one by one and only the failing ones are retried.
+    """
+    decoded: list[tuple[ConsumerRecord, events.OrderUpdated]] = []
+    for record in records:
+        try:
+            decoded.append((record, events.decode(record.value, expected=events.OrderUpdated)))
+        except events.EventDecodeError as e:
+            await dead_letter(producer=producer, records=[record], error=e)
+    if not decoded:
+        return None
+
+    try:
+        await process_messages(update_events=[event for _, event in decoded])
+        return None
+    except Exception as e:
+        logger.error(f'Batch of {len(decoded)} order updates failed, applying them one by one: {e}')
+
+    for record, event in decoded:
+        try:
+            await process_message(update_event=event)
+        except Exception as e:
+            await retry_later(producer=producer, records=[record], error=e)
+
+
+async def process_retry_records(records: list[ConsumerRecord], producer: AIOKafkaProducer) -> None:
+    await wait_until_due(records)
+    await process_update_records(records=records, producer=producer)
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+from uuid import UUID
+
+from redis.asyncio import Redis
+
+from api_v1.orders.schemas import ProductDataSchema
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """In-process LRU cache whose entries also expire after "ttl" seconds."""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable) -> Any | None:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+class ProductCache:
+    """
+    Product data cache: in-process LRU+TTL in front of an optional Redis tier.
+    Entries are dropped on PRODUCT_UPDATED events from catalog service.
+    """
+
+    key_prefix = 'products:'
+
+    def __init__(
+            self,
+            max_size: int,
+            ttl: float,
+            redis: Redis | None = None,
+            redis_ttl: int = 0,
+            redelete_delay: float = 10.0,
+    ):
+        self.local = LRUCache(max_size=max_size, ttl=ttl)
+        self.redis = redis
+        self.redis_ttl = redis_ttl
+        self.redelete_delay = redelete_delay
+        # Incremented on every invalidation, so data fetched before it is not cached afterwards.
+        # Only guards this process: other replicas' writes are undone by the delayed Redis delete.
+        self.generation = 0
+        self._redeletes: set[asyncio.Task] = set()
+
+    def _redis_key(self, product_id: UUID) -> str:
+        return f'{self.key_prefix}{product_id}'
+
+    async def get_many(self, product_ids: list[UUID]) -> dict[UUID, ProductDataSchema]:
+        products: dict[UUID, ProductDataSchema] = {}
+        missing: list[UUID] = []
+        for product_id in product_ids:
+            product = self.local.get(product_id)
+            if product is None:
+                missing.append(product_id)
+            else:
+                products[product_id] = product
+
+        if missing and self.redis is not None:
+            try:
+                cached = await self.redis.mget([self._redis_key(product_id) for product_id in missing])
+            except Exception as e:
+                logger.error(f'Product cache: Redis read failed: {e}')
+                return products
+            for product_id, raw in zip(missing, cached):
+                if raw is not None:
+                    product = ProductDataSchema.model_validate_json(raw)
+                    self.local.set(product_id, product)
+                    products[product_id] = product
+
+        return products
+
+    async def set_many(self, products: dict[UUID, ProductDataSchema], generation: int) -> None:
+        if generation != self.generation:
+            # An invalidation arrived while the data was being fetched: it may already be stale.
+            return
+
+        for product_id, product in products.items():
+            self.local.set(product_id, product)
+
+        if products and self.redis is not None:
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for product_id, product in products.items():
+                        pipe.set(self._redis_key(product_id), product.model_dump_json(), ex=self.redis_ttl)
+                    await pipe.execute()
+            except Exception as e:
+                logger.error(f'Product cache: Redis write failed: {e}')
+
+    async def invalidate(self, product_id: UUID) -> None:
+        """
+        Drops the product from both tiers. The Redis key is deleted again after "redelete_delay",
+        as another replica may store data it fetched before the change in the meantime.
+        """
+        self.generation += 1
+        self.local.delete(product_id)
+        if self.redis is not None:
+            await self._delete_from_redis(product_id=product_id)
+            task = asyncio.create_task(self._delete_from_redis(product_id=product_id, delay=self.redelete_delay))
+            self._redeletes.add(task)
+            task.add_done_callback(self._redeletes.discard)
+
+    async def _delete_from_redis(self, product_id: UUID, delay: float = 0) -> None:
+        if delay:
+            await asyncio.sleep(delay)
+        try:
+            await self.redis.delete(self._redis_key(product_id))
+        except Exception as e:
+            logger.error(f'Product cache: Redis delete failed: {e}')
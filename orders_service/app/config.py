@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic import BaseModel, PostgresDsn
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -7,10 +9,66 @@ class AuthJWT(BaseModel):
     algorithm: str
 
 
+class KafkaProducerConfig(BaseModel):
+    acks: int | Literal['all'] = 'all'
+    enable_idempotence: bool = True  # no duplicates on producer retries; requires acks='all'
+    linger_ms: int = 5  # wait for more messages to fill a batch
+    max_batch_size: int = 65536  # bytes per partition batch
+    compression_type: Literal['gzip', 'snappy', 'lz4', 'zstd'] | None = 'zstd'  # all but gzip need cramjam
+
+
 class KafkaConfig(BaseModel):
     broker: str
     order_create_topic: str
     order_update_topic: str
+    product_update_topic: str = 'update_product'
+    consume_batch_size: int = 500  # max ORDER_UPDATE messages applied in one transaction
+    consume_batch_timeout_ms: int = 200  # max time spent collecting one batch
+    producer: KafkaProducerConfig = KafkaProducerConfig()
+    event_format: Literal['binary', 'json'] = 'binary'  # 'json' while consumers of the former format run
+    partition_key: Literal['order_id', 'user_id'] = 'order_id'  # ORDER_CREATED key: per-order or per-user ordering
+    partitioner: Literal['murmur2', 'crc32'] = 'murmur2'  # maps message keys to partitions
+
+
+class CatalogClientConfig(BaseModel):
+    timeout: float = 3.0  # seconds, per request
+    pool_limit: int = 100  # simultaneous connections in total
+    pool_limit_per_host: int = 50
+    keepalive_timeout: float = 30.0  # seconds an idle connection is kept open
+    dns_cache_ttl: int = 300  # seconds
+    use_batch_endpoint: bool = True  # POST /products/prices; False -> one request per product
+    fetch_concurrency: int = 10  # max per-product requests in flight for one order
+    batch_max_ids: int = 1000  # product ids per POST /products/prices request (catalog limit)
+
+
+class OutboxConfig(BaseModel):
+    batch_size: int = 500  # events published per relay transaction
+    poll_interval: float = 0.2  # seconds the relay waits when the outbox is drained
+    retry_interval: float = 5.0  # seconds the relay waits after a failed batch
+    retention: int = 86400  # seconds sent events are kept before they are purged
+    purge_interval: int = 300  # seconds between purges of sent events
+    purge_batch_size: int = 10000  # sent events deleted per purge transaction
+
+
+class RetryConfig(BaseModel):
+    max_attempts: int = 5  # retries before a message goes to the dead-letter topic
+    backoff_base_ms: int = 1000  # delay before the first retry, doubled for every next one
+    backoff_max_ms: int = 300000
+    retry_topic_suffix: str = '.retry'
+    dead_letter_topic_suffix: str = '.dlq'
+
+
+class RedisConfig(BaseModel):
+    host: str
+    port: int
+    db: int
+
+
+class ProductCacheConfig(BaseModel):
+    max_size: int = 10_000  # products kept in process memory
+    ttl: int = 300  # seconds, in-process tier
+    redis_ttl: int = 3600  # seconds, Redis tier
+    redelete_delay: float = 10.0  # seconds; longer than a catalog fetch that may write data read before a change
 
 
 class DatabaseConfig(BaseModel):
@@ -53,10 +111,18 @@ class Settings(BaseSettings):
     )
     api_v1_prefix: str = '/api/v1'
     product_url: str = 'http://catalog-api:8000/api/v1/products'
+    export_batch_size: int = 1000  # orders fetched from the server-side cursor at once
+    details_max_ids: int = 100  # orders per GET /orders/details request
+    bulk_max_orders: int = 10000  # orders per POST /orders/bulk request
 
     auth_jwt: AuthJWT
     kafka: KafkaConfig
     db: DatabaseConfig
+    catalog_client: CatalogClientConfig = CatalogClientConfig()
+    product_cache: ProductCacheConfig = ProductCacheConfig()
+    outbox: OutboxConfig = OutboxConfig()
+    retry: RetryConfig = RetryConfig()
+    redis: RedisConfig | None = None  # second product cache tier, disabled when not configured
 
 
 settings = Settings()
@@ -1,6 +1,9 @@
+import aiohttp
 from aiokafka import AIOKafkaProducer
 from fastapi import Request
 
+from cache import ProductCache
+
 
 async def get_producer(request: Request) -> AIOKafkaProducer:
     """
@@ -10,3 +13,23 @@ async def get_producer(request: Request) -> AIOKafkaProducer:
     if producer is None:
         raise RuntimeError('AIOKafkaProducer is not initialized')
     return producer
+
+
+async def get_http_session(request: Request) -> aiohttp.ClientSession:
+    """
+    FastAPI dependency to get the shared aiohttp.ClientSession from "app.state".
+    """
+    http_session = getattr(request.app.state, 'http_session', None)
+    if http_session is None:
+        raise RuntimeError('aiohttp.ClientSession is not initialized')
+    return http_session
+
+
+async def get_product_cache(request: Request) -> ProductCache:
+    """
+    FastAPI dependency to get ProductCache from "app.state".
+    """
+    product_cache = getattr(request.app.state, 'product_cache', None)
+    if product_cache is None:
+        raise RuntimeError('ProductCache is not initialized')
+    return product_cache
@@ -0,0 +1,171 @@
+"""
+Order events exchanged between orders_service and order_worker_service.
+Kept identical in both services.
+
+Binary layout (big-endian): header (magic 0xA5, event type, schema version), then the body
+of that type and version. Money is in integer minor units (cents).
+
+    ORDER_CREATED v1: order_id (16 bytes), cart_price (int64), delivery_price (int64)
+    ORDER_UPDATED v1: order_id (16 bytes), cart_price, delivery_price, total_price (int64), status (UTF-8, rest)
+
+JSON fallback keeps the former message shape with prices as floats, plus "event" and "version",
+so consumers not yet reading the binary format keep working during migration.
+A decoder accepts both: JSON always starts with "{", never with the magic byte.
+"""
+import struct
+from dataclasses import dataclass
+from decimal import Decimal, ROUND_HALF_UP
+from typing import ClassVar, TypeVar
+from uuid import UUID
+
+import orjson
+
+MAGIC = 0xA5
+HEADER = struct.Struct('>BBB')
+
+
+class EventDecodeError(ValueError):
+    pass
+
+
+def to_minor_units(amount: Decimal | float) -> int:
+    if isinstance(amount, Decimal):
+        return int((amount * 100).to_integral_value(rounding=ROUND_HALF_UP))
+    return round(amount * 100)
+
+
+def minor_units_to_decimal(amount: int) -> Decimal:
+    return Decimal(amount).scaleb(-2)
+
+
+@dataclass(frozen=True, slots=True)
+class OrderCreated:
+    NAME: ClassVar[str] = 'ORDER_CREATED'
+    TYPE: ClassVar[int] = 1
+    VERSION: ClassVar[int] = 1
+    BODY: ClassVar[struct.Struct] = struct.Struct('>16sqq')
+
+    order_id: UUID
+    cart_price: int  # cents
+    delivery_price: int  # cents
+
+    def encode_body(self) -> bytes:
+        return self.BODY.pack(self.order_id.bytes, self.cart_price, self.delivery_price)
+
+    @classmethod
+    def decode_body(cls, body: bytes) -> 'OrderCreated':
+        order_id, cart_price, delivery_price = cls.BODY.unpack(body)
+        return cls(order_id=UUID(bytes=order_id), cart_price=cart_price, delivery_price=delivery_price)
+
+    def to_json_dict(self) -> dict:
+        return {
+            'order_id': str(self.order_id),
+            'cart_price': self.cart_price / 100,
+            'delivery_price': self.delivery_price / 100,
+        }
+
+    @classmethod
+    def from_json_dict(cls, data: dict) -> 'OrderCreated':
+        return cls(
+            order_id=UUID(data['order_id']),
+            cart_price=to_minor_units(data.get('cart_price', 0.0)),
+            delivery_price=to_minor_units(data.get('delivery_price', 0.0)),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class OrderUpdated:
+    NAME: ClassVar[str] = 'ORDER_UPDATED'
+    TYPE: ClassVar[int] = 2
+    VERSION: ClassVar[int] = 1
+    BODY: ClassVar[struct.Struct] = struct.Struct('>16sqqq')
+
+    order_id: UUID
+    cart_price: int  # cents
+    delivery_price: int  # cents
+    total_price: int  # cents
+    status: str
+
+    def encode_body(self) -> bytes:
+        return (
+            self.BODY.pack(self.order_id.bytes, self.cart_price, self.delivery_price, self.total_price)
+            + self.status.encode('utf-8')
+        )
+
+    @classmethod
+    def decode_body(cls, body: bytes) -> 'OrderUpdated':
+        order_id, cart_price, delivery_price, total_price = cls.BODY.unpack_from(body)
+        return cls(
+            order_id=UUID(bytes=order_id),
+            cart_price=cart_price,
+            delivery_price=delivery_price,
+            total_price=total_price,
+            status=body[cls.BODY.size:].decode('utf-8'),
+        )
+
+    def to_json_dict(self) -> dict:
+        return {
+            'order_id': str(self.order_id),
+            'cart_price': self.cart_price / 100,
+            'delivery_price': self.delivery_price / 100,
+            'total_price': self.total_price / 100,
+            'status': self.status,
+        }
+
+    @classmethod
+    def from_json_dict(cls, data: dict) -> 'OrderUpdated':
+        return cls(
+            order_id=UUID(data['order_id']),
+            cart_price=to_minor_units(data['cart_price']),
+            delivery_price=to_minor_units(data['delivery_price']),
+            total_price=to_minor_units(data['total_price']),
+            status=data['status'],
+        )
+
+
+Event = OrderCreated | OrderUpdated
+E = TypeVar('E', OrderCreated, OrderUpdated)
+
+EVENT_TYPES: dict[int, type[Event]] = {OrderCreated.TYPE: OrderCreated, OrderUpdated.TYPE: OrderUpdated}
+EVENT_NAMES: dict[str, type[Event]] = {OrderCreated.NAME: OrderCreated, OrderUpdated.NAME: OrderUpdated}
+
+
+def encode(event: Event) -> bytes:
+    return HEADER.pack(MAGIC, event.TYPE, event.VERSION) + event.encode_body()
+
+
+def to_json_dict(event: Event) -> dict:
+    return {'event': event.NAME, 'version': event.VERSION, **event.to_json_dict()}
+
+
+def encode_json(event: Event) -> bytes:
+    return orjson.dumps(to_json_dict(event))
+
+
+def from_json_dict(data: dict, default: type[E] | None = None) -> Event:
+    """Event from its JSON form; messages without "event" (former format) are taken as "default"."""
+    event_class = EVENT_NAMES.get(data['event']) if 'event' in data else default
+    if event_class is None:
+        raise EventDecodeError(f'Unknown event: {data.get("event")}')
+    return event_class.from_json_dict(data)
+
+
+def decode(raw: bytes, expected: type[E] | None = None) -> E:
+    """Decodes a binary or JSON message that must hold an "expected" event (any event when None)."""
+    try:
+        if raw[:1] == bytes((MAGIC,)):
+            _, event_type, version = HEADER.unpack_from(raw)
+            event_class = EVENT_TYPES.get(event_type)
+            if event_class is None or version != event_class.VERSION:
+                raise EventDecodeError(f'Unsupported event type {event_type} version {version}')
+            event = event_class.decode_body(raw[HEADER.size:])
+        else:
+            event = from_json_dict(orjson.loads(raw), default=expected)
+    except EventDecodeError:
+        raise
+    except (struct.error, orjson.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+        raise EventDecodeError(f'Malformed {expected.NAME if expected else "event"} message: {e}') from e
+
+    if expected is not None and not isinstance(event, expected):
+        raise EventDecodeError(f'Expected {expected.NAME}, got {event.NAME}')
+    return event
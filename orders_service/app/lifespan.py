@@ -1,33 +1,126 @@
 import asyncio
-import json
 import logging
 from contextlib import asynccontextmanager
 
+import aiohttp
 from aiokafka import AIOKafkaProducer, AIOKafkaConsumer
 from fastapi import FastAPI
+from redis.asyncio import Redis
 
-from api_v1.orders.services import process_message
+from api_v1.orders.services import process_update_records, process_retry_records, process_product_message
+from cache import ProductCache
 from config import settings
+from outbox import relay_outbox
+from partitioners import PARTITIONERS
+from retries import retry_topic
+from serializers import deserialize_json
 
 logger = logging.getLogger(__name__)
 
 
-async def consume_events(consumer: AIOKafkaConsumer):
+async def get_batch(consumer: AIOKafkaConsumer, max_records: int, timeout_ms: int) -> list:
+    """Collects up to "max_records" messages, waiting no longer than "timeout_ms" in total."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout_ms / 1000
+    records = []
+    while len(records) < max_records:
+        remaining_ms = int((deadline - loop.time()) * 1000)
+        if remaining_ms <= 0:
+            break
+        batches = await consumer.getmany(timeout_ms=remaining_ms, max_records=max_records - len(records))
+        for partition_records in batches.values():
+            records.extend(partition_records)
+    return records
+
+
+async def consume_events(consumer: AIOKafkaConsumer, producer: AIOKafkaProducer):
     try:
-        async for msg in consumer:
-            await process_message(message_data=msg.value)
+        while True:
+            records = await get_batch(
+                consumer=consumer,
+                max_records=settings.kafka.consume_batch_size,
+                timeout_ms=settings.kafka.consume_batch_timeout_ms,
+            )
+            if not records:
+                continue
+            await process_update_records(records=records, producer=producer)
+            # One offset commit per batch, after the batch transaction is committed
+            # and failed messages are in the retry or dead-letter topic.
             await consumer.commit()
     finally:
         await consumer.stop()
 
 
+async def consume_retry_events(consumer: AIOKafkaConsumer, producer: AIOKafkaProducer):
+    try:
+        while True:
+            batches = await consumer.getmany(
+                timeout_ms=settings.kafka.consume_batch_timeout_ms,
+                max_records=settings.kafka.consume_batch_size,
+            )
+            for tp, records in batches.items():
+                await process_retry_records(records=records, producer=producer)
+                await consumer.commit({tp: records[-1].offset + 1})
+    finally:
+        await consumer.stop()
+
+
+async def consume_product_events(consumer: AIOKafkaConsumer, product_cache: ProductCache):
+    try:
+        async for msg in consumer:
+            try:
+                await process_product_message(message_data=deserialize_json(msg.value), product_cache=product_cache)
+            except Exception as e:
+                logger.error(f'Skipping product event at offset {msg.offset}: {e}')
+    finally:
+        await consumer.stop()
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """START and STOP: AIOKafkaProducer, AIOKafkaConsumer"""
+    """START and STOP: aiohttp.ClientSession, ProductCache, AIOKafkaProducer, outbox relay, AIOKafkaConsumers"""
+    # --- HTTP CLIENT ---
+    # One pooled session for all catalog calls: connections and DNS lookups are reused between requests.
+    connector = aiohttp.TCPConnector(
+        limit=settings.catalog_client.pool_limit,
+        limit_per_host=settings.catalog_client.pool_limit_per_host,
+        keepalive_timeout=settings.catalog_client.keepalive_timeout,
+        ttl_dns_cache=settings.catalog_client.dns_cache_ttl,
+    )
+    app.state.http_session = aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=settings.catalog_client.timeout),
+    )
+    logger.info('aiohttp.ClientSession created.')
+
+    # --- PRODUCT CACHE ---
+    redis = None
+    if settings.redis is not None:
+        redis = Redis(
+            host=settings.redis.host,
+            port=settings.redis.port,
+            db=settings.redis.db,
+            decode_responses=False,
+        )
+        try:
+            await redis.ping()
+            logger.info('Successfully connected to Redis.')
+        except Exception as e:
+            logger.error(f'Failed to connect to Redis: {e}')
+    app.state.redis = redis
+    app.state.product_cache = ProductCache(
+        max_size=settings.product_cache.max_size,
+        ttl=settings.product_cache.ttl,
+        redis=redis,
+        redis_ttl=settings.product_cache.redis_ttl,
+        redelete_delay=settings.product_cache.redelete_delay,
+    )
+
     # --- PRODUCER ---
     producer = AIOKafkaProducer(
         bootstrap_servers=[settings.kafka.broker],
-        value_serializer=lambda v: json.dumps(v).encode('utf-8'),
+        partitioner=PARTITIONERS[settings.kafka.partitioner],
+        **settings.kafka.producer.model_dump(),
     )
     try:
         await producer.start()
@@ -37,11 +130,17 @@ async def lifespan(app: FastAPI):
         app.state.producer = None
         logger.error(f'Could not connect to AIOKafkaProducer: {e}')
 
+    # --- OUTBOX RELAY ---
+    producer = getattr(app.state, 'producer', None)
+    if producer:
+        app.state.outbox_relay_task = asyncio.create_task(relay_outbox(producer=producer))
+    else:
+        logger.error('Outbox relay is not started: no AIOKafkaProducer.')
+
     # --- CONSUMER ---
     consumer = AIOKafkaConsumer(
         settings.kafka.order_update_topic,
         bootstrap_servers=[settings.kafka.broker],
-        value_deserializer=lambda v: json.loads(v.decode('utf-8')),
         auto_offset_reset='earliest',
         enable_auto_commit=False,
         group_id='orders_service_group'
@@ -54,14 +153,90 @@ async def lifespan(app: FastAPI):
         app.state.consumer = None
         logger.error(f'Could not connect to AIOKafkaConsumer: {e}')
 
-    # --- START CONSUMER TASK ---
+    # --- RETRY CONSUMER ---
+    # Own consumer: updates waiting for their retry time never hold up new ones.
+    retry_consumer = AIOKafkaConsumer(
+        retry_topic(settings.kafka.order_update_topic),
+        bootstrap_servers=[settings.kafka.broker],
+        auto_offset_reset='earliest',
+        enable_auto_commit=False,
+        group_id='orders_service_retry_group'
+    )
+    try:
+        await retry_consumer.start()
+        app.state.retry_consumer = retry_consumer
+        logger.info('Successfully connected to retry AIOKafkaConsumer.')
+    except Exception as e:
+        app.state.retry_consumer = None
+        logger.error(f'Could not connect to retry AIOKafkaConsumer: {e}')
+
+    # --- PRODUCT EVENTS CONSUMER ---
+    # No group: every replica must receive every PRODUCT_UPDATED to invalidate its own cache.
+    product_consumer = AIOKafkaConsumer(
+        settings.kafka.product_update_topic,
+        bootstrap_servers=[settings.kafka.broker],
+        auto_offset_reset='latest',
+        group_id=None,
+    )
+    try:
+        await product_consumer.start()
+        app.state.product_consumer = product_consumer
+        logger.info('Successfully connected to product events AIOKafkaConsumer.')
+    except Exception as e:
+        app.state.product_consumer = None
+        logger.error(f'Could not connect to product events AIOKafkaConsumer: {e}')
+
+    # --- START CONSUMER TASKS ---
+    # Failed updates are re-published to the retry or dead-letter topic, so the consumers need the producer.
     consumer = getattr(app.state, 'consumer', None)
-    if consumer:
-        consumer_task = asyncio.create_task(consume_events(consumer=consumer))
+    if consumer and producer:
+        consumer_task = asyncio.create_task(consume_events(consumer=consumer, producer=producer))
         app.state.consumer_task = consumer_task
 
+    retry_consumer = getattr(app.state, 'retry_consumer', None)
+    if retry_consumer and producer:
+        retry_consumer_task = asyncio.create_task(consume_retry_events(consumer=retry_consumer, producer=producer))
+        app.state.retry_consumer_task = retry_consumer_task
+
+    product_consumer = getattr(app.state, 'product_consumer', None)
+    if product_consumer:
+        product_consumer_task = asyncio.create_task(
+            consume_product_events(consumer=product_consumer, product_cache=app.state.product_cache)
+        )
+        app.state.product_consumer_task = product_consumer_task
+
     yield
 
+    # --- CANCEL OUTBOX RELAY ---
+    # Before the producer stops: an interrupted batch stays unsent and is published after restart.
+    outbox_relay_task = getattr(app.state, 'outbox_relay_task', None)
+    if outbox_relay_task:
+        outbox_relay_task.cancel()
+        try:
+            await outbox_relay_task
+        except asyncio.CancelledError:
+            logger.info('Outbox relay task successfully canceled')
+
+    # --- CANCEL CONSUMER TASKS ---
+    # Before the producer stops: they re-publish failed messages with it.
+    consumer_task = getattr(app.state, 'consumer_task', None)
+    if consumer_task:
+        consumer_task.cancel()
+        try:
+            await consumer_task
+        except asyncio.CancelledError:
+            logger.info('Consumer task successfully canceled')
+    else:
+        logger.info('No active consumer task found in "app.state" to cancel.')
+
+    retry_consumer_task = getattr(app.state, 'retry_consumer_task', None)
+    if retry_consumer_task:
+        retry_consumer_task.cancel()
+        try:
+            await retry_consumer_task
+        except asyncio.CancelledError:
+            logger.info('Retry consumer task successfully canceled')
+
     # --- SHUTDOWN PRODUCER ---
     producer = getattr(app.state, 'producer', None)
     if producer:
@@ -79,13 +254,33 @@ async def lifespan(app: FastAPI):
     else:
         logger.info('No active AIOKafkaConsumer found in "app.state" to close.')
 
-    # --- CANCEL CONSUMER TASK ---
-    consumer_task = getattr(app.state, 'consumer_task', None)
-    if consumer_task:
-        consumer_task.cancel()
+    retry_consumer = getattr(app.state, 'retry_consumer', None)
+    if retry_consumer:
+        await retry_consumer.stop()
+        logger.info('Retry AIOKafkaConsumer closed')
+
+    # --- SHUTDOWN PRODUCT EVENTS CONSUMER ---
+    product_consumer = getattr(app.state, 'product_consumer', None)
+    if product_consumer:
+        await product_consumer.stop()
+        logger.info('Product events AIOKafkaConsumer closed')
+
+    # --- SHUTDOWN HTTP CLIENT ---
+    http_session = getattr(app.state, 'http_session', None)
+    if http_session:
+        await http_session.close()
+        logger.info('aiohttp.ClientSession closed')
+
+    product_consumer_task = getattr(app.state, 'product_consumer_task', None)
+    if product_consumer_task:
+        product_consumer_task.cancel()
         try:
-            await consumer_task
+            await product_consumer_task
         except asyncio.CancelledError:
-            logger.info('Consumer task successfully canceled')
-    else:
-        logger.info('No active consumer task found in "app.state" to cancel.')
+            logger.info('Product events consumer task successfully canceled')
+
+    # --- SHUTDOWN REDIS ---
+    redis = getattr(app.state, 'redis', None)
+    if redis:
+        await redis.aclose()
+        logger.info('Redis connection closed')
@@ -2,8 +2,10 @@ __all__ = (
     'Base',
     'Order',
     'OrderItem',
+    'OutboxEvent',
 )
 
 from .base import Base
 from .order import Order
 from .order_items import OrderItem
+from .outbox import OutboxEvent
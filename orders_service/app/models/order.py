@@ -3,7 +3,7 @@ from datetime import datetime, timezone
 from decimal import Decimal
 from typing import TYPE_CHECKING
 
-from sqlalchemy import DateTime, func, Numeric, String
+from sqlalchemy import DateTime, func, Index, Numeric, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from models import Base
@@ -14,6 +14,12 @@ if TYPE_CHECKING:
 
 class Order(Base):
     __tablename__ = 'orders'
+    __table_args__ = (
+        # keyset pagination: ORDER BY created_at DESC, id DESC, optionally filtered by user_id or status
+        Index('ix_orders_created_at_id', 'created_at', 'id'),
+        Index('ix_orders_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+        Index('ix_orders_status_created_at_id', 'status', 'created_at', 'id'),
+    )
 
     user_id: Mapped[uuid.UUID]
     total_price: Mapped[Decimal] = mapped_column(Numeric(10, 2))
@@ -22,7 +28,7 @@ class Order(Base):
     status: Mapped[str] = mapped_column(String(20))
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
-        default=datetime.now(timezone.utc),
+        default=lambda: datetime.now(timezone.utc),
         server_default=func.now(),
     )
 
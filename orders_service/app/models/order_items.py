@@ -14,7 +14,7 @@ if TYPE_CHECKING:
 class OrderItem(Base):
     __tablename__ = 'order_items'
 
-    order_id: Mapped[uuid.UUID] = mapped_column(ForeignKey('orders.id'))
+    order_id: Mapped[uuid.UUID] = mapped_column(ForeignKey('orders.id'), index=True)
     product_id: Mapped[uuid.UUID]
     quantity: Mapped[int]
     unit_price: Mapped[Decimal] = mapped_column(Numeric(10, 2))
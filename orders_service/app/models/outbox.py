@@ -0,0 +1,26 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import DateTime, func, Index, LargeBinary, String, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from models import Base
+
+
+class OutboxEvent(Base):
+    """Kafka message written in the same transaction as the change it announces."""
+
+    __tablename__ = 'outbox'
+    __table_args__ = (
+        # relay: oldest unsent events first; sent rows are not indexed
+        Index('ix_outbox_unsent_created_at', 'created_at', postgresql_where=text('sent_at IS NULL')),
+    )
+
+    topic: Mapped[str] = mapped_column(String(255))
+    key: Mapped[str | None] = mapped_column(String(255))  # Kafka message key: events with one key keep their order
+    encoded_event: Mapped[bytes] = mapped_column(LargeBinary)  # events.encode(): binary, integer minor units
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        server_default=func.now(),
+    )
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
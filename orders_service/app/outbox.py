@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+from aiokafka import AIOKafkaProducer
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import events
+from config import settings
+from db import async_session
+from models import OutboxEvent
+from serializers import serialize_event
+
+logger = logging.getLogger(__name__)
+
+
+def outbox_message(outbox_event: OutboxEvent) -> bytes:
+    """Kafka value of the event in "kafka.event_format"; binary events are sent as stored."""
+    if settings.kafka.event_format == 'binary':
+        return outbox_event.encoded_event
+    return serialize_event(events.decode(outbox_event.encoded_event))
+
+
+async def publish_outbox_batch(session: AsyncSession, producer: AIOKafkaProducer, batch_size: int) -> int:
+    """
+    Publishes the oldest unsent outbox events and marks them sent, in one transaction.
+    Rows locked by another relay are skipped, so several replicas can drain the outbox together.
+    Returns the number of published events.
+    """
+    async with session.begin():
+        result = await session.scalars(
+            select(OutboxEvent)
+            .where(OutboxEvent.sent_at.is_(None))
+            .order_by(OutboxEvent.created_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        outbox_events = list(result.all())
+        if not outbox_events:
+            return 0
+
+        # All sends are queued before any is awaited, so the producer packs them into few requests.
+        deliveries = [
+            await producer.send(
+                topic=event.topic,
+                key=event.key.encode('utf-8') if event.key is not None else None,
+                value=outbox_message(event),
+            )
+            for event in outbox_events
+        ]
+        await asyncio.gather(*deliveries)
+
+        await session.execute(
+            update(OutboxEvent)
+            .where(OutboxEvent.id.in_([event.id for event in outbox_events]))
+            .values(sent_at=datetime.now(timezone.utc))
+            .execution_options(synchronize_session=False)
+        )
+    return len(outbox_events)
+
+
+async def purge_sent_outbox(session: AsyncSession, retention: timedelta, batch_size: int) -> int:
+    """Deletes events sent more than "retention" ago, "batch_size" rows per transaction. Returns the count."""
+    purged = 0
+    while True:
+        async with session.begin():
+            sent_ids = (
+                select(OutboxEvent.id)
+                .where(OutboxEvent.sent_at < datetime.now(timezone.utc) - retention)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+                .scalar_subquery()
+            )
+            result = await session.execute(delete(OutboxEvent).where(OutboxEvent.id.in_(sent_ids)))
+        purged += result.rowcount
+        if result.rowcount < batch_size:
+            return purged
+
+
+async def relay_outbox(producer: AIOKafkaProducer) -> None:
+    """
+    Background task: moves outbox events to Kafka, and every "outbox.purge_interval" seconds
+    deletes the events sent more than "outbox.retention" seconds ago.
+    A crash after sending but before the commit sends the batch again (at-least-once).
+    """
+    next_purge = time.monotonic()
+    while True:
+        if time.monotonic() >= next_purge:
+            next_purge = time.monotonic() + settings.outbox.purge_interval
+            try:
+                async with async_session() as session:
+                    purged = await purge_sent_outbox(
+                        session=session,
+                        retention=timedelta(seconds=settings.outbox.retention),
+                        batch_size=settings.outbox.purge_batch_size,
+                    )
+                if purged:
+                    logger.info(f'Outbox: {purged} sent events purged.')
+            except Exception as e:
+                logger.error(f'Outbox purge failed: {e}')
+
+        try:
+            async with async_session() as session:
+                published = await publish_outbox_batch(
+                    session=session,
+                    producer=producer,
+                    batch_size=settings.outbox.batch_size,
+                )
+        except Exception as e:
+            logger.error(f'Outbox relay failed: {e}')
+            await asyncio.sleep(settings.outbox.retry_interval)
+            continue
+
+        if published < settings.outbox.batch_size:
+            await asyncio.sleep(settings.outbox.poll_interval)
@@ -0,0 +1,18 @@
+import random
+import zlib
+
+from aiokafka.partitioner import DefaultPartitioner
+
+
+def crc32_partitioner(key: bytes | None, all_partitions: list[int], available: list[int]) -> int:
+    """CRC32 of the key, as librdkafka's "consistent" partitioner; keyless messages go to a random partition."""
+    if key is None:
+        return random.choice(available or all_partitions)
+    return all_partitions[zlib.crc32(key) % len(all_partitions)]
+
+
+PARTITIONERS = {
+    # Java client default: murmur2 of the key. Keep it while Java/Kafka Streams apps share the topics.
+    'murmur2': DefaultPartitioner(),
+    'crc32': crc32_partitioner,
+}
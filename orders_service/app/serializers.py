@@ -0,0 +1,35 @@
+import logging
+from typing import Any
+
+import orjson
+
+import events
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def serialize_json(value: Any) -> bytes:
+    """Kafka value serializer: orjson, compact, UTF-8. Decimal must be converted by the caller."""
+    return orjson.dumps(value)
+
+
+def deserialize_json(raw: bytes) -> Any:
+    return orjson.loads(raw)
+
+
+def serialize_event(event: events.Event) -> bytes:
+    if settings.kafka.event_format == 'json':
+        return events.encode_json(event)
+    return events.encode(event)
+
+
+def event_deserializer(expected: type[events.E]):
+    """Kafka value deserializer of "expected" events; a malformed message becomes None and is skipped."""
+    def deserialize_event(raw: bytes) -> events.E | None:
+        try:
+            return events.decode(raw, expected=expected)
+        except events.EventDecodeError as e:
+            logger.error(f'Skipping message: {e}')
+            return None
+    return deserialize_event
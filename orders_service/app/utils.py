@@ -1,49 +1,172 @@
+import asyncio
 from uuid import UUID
 
 import aiohttp
 from fastapi import HTTPException, status
 
-from api_v1.orders.schemas import ProductDataSchema
+from api_v1.orders.schemas import ProductDataSchema, ProductPriceSchema
+from cache import ProductCache
 from config import settings
 
 
-async def fetch_product_data(product_id: UUID, token: str) -> ProductDataSchema:
+async def fetch_product_data(
+        product_id: UUID,
+        token: str,
+        session: aiohttp.ClientSession,
+) -> ProductDataSchema:
     """Makes HTTP request to the product microservice to retrieve product data."""
 
     url = f'{settings.product_url}/{product_id}'
     headers = {'Authorization': f'Bearer {token}'}
-    timeout = aiohttp.ClientTimeout(total=3.0)
-
-    async with aiohttp.ClientSession(timeout=timeout) as session:
-        try:
-            async with session.get(url=url, headers=headers) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return ProductDataSchema(**data)
-                elif response.status == 404:
-                    raise HTTPException(
-                        status_code=status.HTTP_404_NOT_FOUND,
-                        detail='The product with ID {product_id} is not found in the catalog.',
-                    )
-                else:
-                    text = await response.text()
-                    raise HTTPException(
-                        status_code=status.HTTP_502_BAD_GATEWAY,
-                        detail=f'Catalog service error: {response.status} - {text}',
-                    )
-
-        except aiohttp.ClientConnectionError:
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail='No connection with catalog service. Try again later.',
-            )
-        except aiohttp.ClientTimeout:
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail='Catalog service is temporarily unavailable. Try again later.',
-            )
-
-    raise HTTPException(
-        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        detail='Unknown error when querying the catalog service.',
-    )
+
+    try:
+        async with session.get(url=url, headers=headers) as response:
+            if response.status == 200:
+                data = await response.json()
+                return ProductDataSchema(**data)
+            elif response.status == 404:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f'The product with ID {product_id} is not found in the catalog.',
+                )
+            else:
+                text = await response.text()
+                raise HTTPException(
+                    status_code=status.HTTP_502_BAD_GATEWAY,
+                    detail=f'Catalog service error: {response.status} - {text}',
+                )
+
+    except aiohttp.ClientConnectionError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='No connection with catalog service. Try again later.',
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='Catalog service is temporarily unavailable. Try again later.',
+        )
+
+
+async def fetch_products_data(
+        product_ids: list[UUID],
+        token: str,
+        session: aiohttp.ClientSession,
+) -> dict[UUID, ProductDataSchema]:
+    """
+    Retrieves the prices of all given products with one request to the
+    product microservice per "catalog_client.batch_max_ids" products.
+    Raises 404 listing every ID missing from the catalog.
+    """
+
+    unique_ids = list(dict.fromkeys(product_ids))
+    if not unique_ids:
+        return {}
+
+    batch_max_ids = settings.catalog_client.batch_max_ids
+    if len(unique_ids) > batch_max_ids:
+        products: dict[UUID, ProductDataSchema] = {}
+        for i in range(0, len(unique_ids), batch_max_ids):
+            products.update(await fetch_products_data(
+                product_ids=unique_ids[i:i + batch_max_ids],
+                token=token,
+                session=session,
+            ))
+        return products
+
+    url = f'{settings.product_url}/prices'
+    headers = {'Authorization': f'Bearer {token}'}
+    body = {'ids': [str(product_id) for product_id in unique_ids]}
+
+    try:
+        async with session.post(url=url, headers=headers, json=body) as response:
+            if response.status == 200:
+                data = await response.json()
+            else:
+                text = await response.text()
+                raise HTTPException(
+                    status_code=status.HTTP_502_BAD_GATEWAY,
+                    detail=f'Catalog service error: {response.status} - {text}',
+                )
+
+    except aiohttp.ClientConnectionError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='No connection with catalog service. Try again later.',
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='Catalog service is temporarily unavailable. Try again later.',
+        )
+
+    products: dict[UUID, ProductDataSchema] = {}
+    for item in data:
+        product = ProductPriceSchema(**item)
+        products[product.id] = product
+
+    not_found = [str(product_id) for product_id in unique_ids if product_id not in products]
+    if not_found:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={
+                'message': 'Some products are not found in the catalog.',
+                'product_ids': not_found,
+            },
+        )
+    return products
+
+
+async def fetch_products_data_concurrently(
+        product_ids: list[UUID],
+        token: str,
+        session: aiohttp.ClientSession,
+) -> dict[UUID, ProductDataSchema]:
+    """
+    Retrieves product data with one request per product, running at most
+    "catalog_client.fetch_concurrency" requests at a time. The first failure
+    (e.g. 404) cancels the outstanding requests and is raised as is.
+    """
+
+    unique_ids = list(dict.fromkeys(product_ids))
+    semaphore = asyncio.Semaphore(settings.catalog_client.fetch_concurrency)
+
+    async def fetch(product_id: UUID) -> ProductDataSchema:
+        async with semaphore:
+            return await fetch_product_data(product_id=product_id, token=token, session=session)
+
+    try:
+        async with asyncio.TaskGroup() as tg:
+            tasks = {product_id: tg.create_task(fetch(product_id)) for product_id in unique_ids}
+    except ExceptionGroup as eg:
+        raise eg.exceptions[0]
+
+    return {product_id: task.result() for product_id, task in tasks.items()}
+
+
+async def fetch_cart_products_data(
+        product_ids: list[UUID],
+        token: str,
+        session: aiohttp.ClientSession,
+        cache: ProductCache,
+) -> dict[UUID, ProductDataSchema]:
+    """
+    Retrieves data of all cart products. Cached products are taken from ProductCache,
+    the rest are requested from the product microservice with the configured strategy.
+    """
+
+    unique_ids = list(dict.fromkeys(product_ids))
+    generation = cache.generation
+    products = await cache.get_many(unique_ids)
+    missing = [product_id for product_id in unique_ids if product_id not in products]
+    if not missing:
+        return products
+
+    if settings.catalog_client.use_batch_endpoint:
+        fetched = await fetch_products_data(product_ids=missing, token=token, session=session)
+    else:
+        fetched = await fetch_products_data_concurrently(product_ids=missing, token=token, session=session)
+
+    await cache.set_many(products=fetched, generation=generation)
+    products.update(fetched)
+    return products